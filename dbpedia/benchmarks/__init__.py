@@ -0,0 +1,59 @@
+# coding: utf-8
+
+"""
+Benchmarks for DBpedia quepy.
+
+Run them as modules from the directory holding main.py, ie:
+
+    python -m benchmarks.matching
+"""
+
+import re
+import time
+
+from quepy.parsing import QuestionTemplate
+
+_example = re.compile(r"^\s*(?:Ex:)?\s*\"?(.*?)\"?\.?\s*$")
+
+
+def template_questions(parsing_module):
+    """
+    Returns ``(template name, question)`` pairs for every example question
+    written in the docstrings of the templates in `parsing_module`.
+    """
+
+    questions = []
+    for name in sorted(dir(parsing_module)):
+        element = getattr(parsing_module, name)
+        try:
+            if not issubclass(element, QuestionTemplate) or \
+                    element is QuestionTemplate:
+                continue
+        except TypeError:
+            continue
+
+        lines = (element.__doc__ or "").splitlines()
+        examples = False
+        for line in lines:
+            if "Ex:" in line:
+                examples = True
+            if examples and line.strip():
+                question = _example.match(line).group(1).strip()
+                if question:
+                    questions.append((name, question.decode("utf-8")))
+    return questions
+
+
+def best_of(function, repeat=5):
+    """
+    Runs `function` `repeat` times and returns the fastest run in seconds.
+    """
+
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
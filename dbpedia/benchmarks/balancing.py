@@ -0,0 +1,121 @@
+# coding: utf-8
+
+"""
+Balancing benchmark: query throughput over 1 to `--endpoints` local
+stand-in mirrors (see sparql_stub.py), then the ejection of a mirror
+that starts failing and its re-admission once it answers again.
+
+    python -m benchmarks.balancing [--endpoints 4] [--latency 0.05]
+        [--pool-size 4] [--concurrency 32] [--duration 5]
+
+Each mirror answers `--pool-size` queries at a time (the connections
+kept to it), so throughput should grow with the number of mirrors.
+"""
+
+import time
+import logging
+import argparse
+import threading
+from itertools import count
+
+from dbpedia.balancer import BalancedClient
+from dbpedia.client import SparqlClient
+from sparql_stub import StubEndpoint
+from benchmarks.load import EmptyUpstream
+
+
+def start_stubs(n, latency):
+    stubs = [StubEndpoint(("127.0.0.1", 0), {}, latency=latency, seed=i,
+                          upstream=EmptyUpstream()) for i in xrange(n)]
+    for stub in stubs:
+        stub.start()
+    return stubs
+
+
+def throughput(client, concurrency, duration):
+    """
+    Sends distinct queries from `concurrency` threads for `duration`
+    seconds, returns the queries answered per second and those failed.
+    """
+
+    queries = count()
+    lock = threading.Lock()
+    done = {"answered": 0, "failed": 0}
+    deadline = time.time() + duration
+
+    def worker():
+        while time.time() < deadline:
+            with lock:
+                i = next(queries)
+            query = u"SELECT * WHERE {{ ?s ?p {0} }}".format(i)
+            try:
+                client.query(query)
+                outcome = "answered"
+            except Exception:
+                outcome = "failed"
+            with lock:
+                done[outcome] += 1
+
+    start = time.time()
+    threads = [threading.Thread(target=worker) for _ in xrange(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return done["answered"] / (time.time() - start), done["failed"]
+
+
+def ejection(stubs, pool_size, concurrency):
+    """
+    Fails the first mirror for a while and prints the state of the
+    balancer as it's ejected and re-admitted.
+    """
+
+    client = BalancedClient([SparqlClient(stub.url, pool_size=pool_size)
+                             for stub in stubs], health_interval=0.5)
+
+    def report(label):
+        qps, failed = throughput(client, concurrency, 1)
+        states = ["ejected" if x["ejected"] else "up"
+                  for x in client.stats()]
+        print "  {:<22} {:>7.1f} queries/s {:>4} failed  {}".format(
+            label, qps, failed, " ".join(states))
+
+    report("all answering")
+    stubs[0].error_rate = 1
+    report("first failing")
+    report("first failing")
+    stubs[0].error_rate = 0
+    time.sleep(1)
+    report("first answering again")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--endpoints", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(format="  %(message)s")
+
+    stubs = start_stubs(args.endpoints, args.latency)
+    n = 1
+    while n <= args.endpoints:
+        client = BalancedClient([SparqlClient(stub.url,
+                                              pool_size=args.pool_size)
+                                 for stub in stubs[:n]])
+        qps, failed = throughput(client, args.concurrency, args.duration)
+        client.close()
+        print "{} endpoints: {:.1f} queries/s, {} failed".format(
+            n, qps, failed)
+        n *= 2
+
+    if args.endpoints > 1:
+        print "Ejection:"
+        ejection(stubs, args.pool_size, args.concurrency)
+
+    for stub in stubs:
+        stub.shutdown()
@@ -0,0 +1,285 @@
+# coding: utf-8
+
+"""
+End to end load benchmark: question -> get_query -> SPARQL -> rendering.
+
+Asks questions for `--duration` seconds against a local stand-in
+endpoint (see sparql_stub.py) or any `--endpoint`, then reports latency
+percentiles, throughput and the mix of outcomes. In the server mode
+`--concurrency` threads ask them with main.answer_question, as server.py
+does. In the batch mode they go through main.iter_results with
+`--concurrency` workers and `--combine` queries per request, as
+main.py --batch does.
+
+    python -m benchmarks.load [--corpus questions.txt]
+        [--recordings recordings.jsonl] [--latency 0.05] [--error-rate 0]
+        [--mode server|batch] [--concurrency 8] [--combine 8]
+        [--duration 30] [--cache]
+        [--output results.json] [--compare baseline.json]
+
+The corpus defaults to the template docstring questions. Without
+recordings the stand-in answers every query with no bindings.
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+from itertools import cycle
+from collections import deque
+
+import dbpedia
+import main
+from dbpedia.cache import CachedClient, ResultCache
+from dbpedia.client import SparqlClient
+from sparql_stub import StubEndpoint, load_recordings
+from benchmarks import template_questions
+
+
+class EmptyUpstream(object):
+    """
+    Stand-in upstream answering every query with no bindings.
+    """
+
+    endpoint = "empty"
+
+    def query(self, query):
+        return {"head": {"vars": []}, "results": {"bindings": []}}
+
+
+def outcome(record):
+    """
+    The outcome of the rendered `record` of a question.
+    """
+
+    if record["query"] is None:
+        return "no_query"
+    error = record.get("error")
+    if error is not None:
+        status = re.match(r"SparqlError: (\d+)", error)
+        if status is not None:
+            return "http_{0}".format(status.group(1))
+        return "error_{0}".format(error.split(":")[0])
+    if not record["answers"]:
+        return "no_answer"
+    return "ok"
+
+
+def percentile(values, fraction):
+    """
+    Nearest rank percentile of the sorted `values`.
+    """
+
+    if not values:
+        return None
+    index = max(0, int(round(fraction * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def summary(latencies, elapsed, outcomes):
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "elapsed": elapsed,
+        "qps": len(latencies) / elapsed,
+        "latency": {
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "outcomes": outcomes,
+    }
+
+
+def run_server(questions, concurrency, duration):
+    """
+    Asks `questions` with `main.answer_question`, as server.py does, from
+    `concurrency` threads for `duration` seconds.
+    """
+
+    questions = cycle(questions)
+    lock = threading.Lock()
+    latencies = []
+    outcomes = {}
+    deadline = time.time() + duration
+
+    def worker():
+        while time.time() < deadline:
+            with lock:
+                question = next(questions)
+            start = time.time()
+            try:
+                result = outcome(main.answer_question(question))
+            except Exception as error:
+                result = "error_{0}".format(type(error).__name__)
+            elapsed = time.time() - start
+            with lock:
+                latencies.append(elapsed)
+                outcomes[result] = outcomes.get(result, 0) + 1
+
+    start = time.time()
+    threads = [threading.Thread(target=worker) for _ in xrange(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summary(latencies, time.time() - start, outcomes)
+
+
+def run_batch(questions, concurrency, duration, combine_size):
+    """
+    Answers `questions` with `main.iter_results`, as the --batch mode
+    does, with `concurrency` workers and `combine_size` queries per
+    request, feeding it questions for `duration` seconds. The latency of
+    a question is counted from when it's read to when it's rendered.
+    """
+
+    latencies = []
+    outcomes = {}
+    starts = deque()
+    deadline = time.time() + duration
+
+    def feed():
+        for question in cycle(questions):
+            if time.time() >= deadline:
+                return
+            starts.append(time.time())
+            yield question
+
+    start = time.time()
+    for record, results in main.iter_results(feed(), concurrency,
+                                             combine_size=combine_size):
+        try:
+            result = outcome(main.render_record(record, results))
+        except Exception as error:
+            result = "error_{0}".format(type(error).__name__)
+        latencies.append(time.time() - starts.popleft())
+        outcomes[result] = outcomes.get(result, 0) + 1
+    return summary(latencies, time.time() - start, outcomes)
+
+
+def compare(result, baseline, tolerance):
+    """
+    Prints the change against `baseline` and returns False if throughput
+    dropped or p95 latency grew by more than `tolerance`.
+    """
+
+    if not baseline["qps"] or not baseline["latency"]["p95"]:
+        print "The baseline has no answered questions to compare with"
+        return False
+    if result["latency"]["p95"] is None:
+        print "vs baseline: no question was answered"
+        return False
+
+    qps = result["qps"] / baseline["qps"] - 1
+    p95 = result["latency"]["p95"] / baseline["latency"]["p95"] - 1
+    print "vs baseline: qps {:+.1%}, p95 {:+.1%}".format(qps, p95)
+    return qps >= -tolerance and p95 <= tolerance
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus")
+    parser.add_argument("--endpoint")
+    parser.add_argument("--recordings")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--mode", choices=("server", "batch"),
+                        default="server")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--combine", type=int, default=main.COMBINE_SIZE)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--cache", action="store_true",
+                        help="keep the compile and result caches enabled")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.corpus:
+        questions = list(main.iter_questions(open(args.corpus)))
+    else:
+        main.dbpedia.load()
+        questions = [q for _, q in template_questions(dbpedia)]
+
+    stub = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        recordings = {}
+        if args.recordings:
+            recordings = load_recordings(args.recordings)
+            if not recordings:
+                sys.stderr.write("No recordings found in {0}, see "
+                                 "sparql_stub.py --record\n".format(
+                                     args.recordings))
+        if not recordings:
+            sys.stderr.write("The stand-in endpoint answers every query "
+                             "with no bindings, answers aren't rendered\n")
+
+        if recordings:
+            stub = StubEndpoint(("127.0.0.1", 0), recordings,
+                                latency=args.latency, jitter=args.jitter,
+                                error_rate=args.error_rate, seed=0)
+        else:
+            stub = StubEndpoint(("127.0.0.1", 0), {}, latency=args.latency,
+                                jitter=args.jitter,
+                                error_rate=args.error_rate, seed=0,
+                                upstream=EmptyUpstream())
+        endpoint = stub.start()
+
+    client = SparqlClient(endpoint, pool_size=args.concurrency)
+    if args.cache:
+        main.sparql = CachedClient(client, ResultCache(path=None))
+    else:
+        # No TTL for any query type, nothing gets cached.
+        main.sparql = CachedClient(client, ResultCache(path=None, ttls={}))
+        main.dbpedia.compiled = None
+
+    if args.mode == "server":
+        result = run_server(questions, args.concurrency, args.duration)
+    else:
+        result = run_batch(questions, args.concurrency, args.duration,
+                           args.combine)
+    main.sparql.close()
+    if stub is not None:
+        stub.shutdown()
+    result["config"] = {
+        "endpoint": endpoint if args.endpoint else "stub",
+        "questions": len(questions),
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "combine": args.combine if args.mode == "batch" else None,
+        "duration": args.duration,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "cache": args.cache,
+        "python": platform.python_version(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    latency = result["latency"]
+    print "{} requests in {:.1f}s: {:.1f} questions/s".format(
+        result["requests"], result["elapsed"], result["qps"])
+    if latency["max"] is not None:
+        print "latency p50 {:.1f}ms p95 {:.1f}ms p99 {:.1f}ms " \
+            "max {:.1f}ms".format(
+                *[latency[x] * 1000 for x in ("p50", "p95", "p99", "max")])
+    for outcome, count in sorted(result["outcomes"].items()):
+        print "  {:<24} {}".format(outcome, count)
+    if not result["outcomes"].get("ok"):
+        print "No question was answered, rendering wasn't measured"
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2, sort_keys=True)
+
+    if args.compare:
+        if not compare(result, json.load(open(args.compare)),
+                       args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,75 @@
+# coding: utf-8
+
+"""
+Synonym matching benchmark: the templates matched against every tagged
+docstring question, with their synonym groups built as the chained
+`Lemma` alternations they used to be and as the `LemmaSet`/`LemmaTrie`
+patterns `Synonyms.getLemmaPreposition` returns now. Checks that both
+interpret every question the same way.
+
+    python -m benchmarks.matching
+"""
+
+from importlib import import_module
+
+import dbpedia
+from dbpedia import settings, synonyms
+from dbpedia.app import install
+from benchmarks import template_questions, best_of
+
+
+def chained_alternation(words):
+    topic = synonyms.Synonyms().applyLemma(words[0])
+    for word in words[1:]:
+        topic |= synonyms.Synonyms().applyLemma(word)
+    return topic
+
+
+def build_rules(names, alternation):
+    """
+    Returns the templates called `names` with their domain modules
+    imported again, synonym groups built by `alternation`.
+    """
+
+    current = synonyms.lemma_alternation
+    synonyms.lemma_alternation = alternation
+    try:
+        classes = {}
+        for domain in sorted(settings.DOMAINS, key=dbpedia.ALL_DOMAINS.index):
+            module = reload(import_module("dbpedia." + domain))
+            classes.update(vars(module))
+    finally:
+        synonyms.lemma_alternation = current
+    return [classes[name]() for name in names]
+
+
+def match_all(rules, questions):
+    """
+    Returns the names of the templates matching each of `questions`.
+    """
+
+    matches = []
+    for words in questions:
+        matches.append([type(rule).__name__ for rule in rules
+                        if rule.get_interpretation(words)[0] is not None])
+    return matches
+
+
+if __name__ == "__main__":
+    app = install()
+    app.load()
+    questions = [list(app.tagger(question))
+                 for _, question in template_questions(dbpedia)]
+
+    names = [type(rule).__name__ for rule in app.rules]
+    chained = build_rules(names, chained_alternation)
+    sets = build_rules(names, synonyms.lemma_alternation)
+    assert match_all(chained, questions) == match_all(sets, questions)
+
+    print "{} templates, {} questions".format(len(names), len(questions))
+
+    before = best_of(lambda: match_all(chained, questions))
+    after = best_of(lambda: match_all(sets, questions))
+    print "chained Lemma alternation: {:.3f}s".format(before)
+    print "LemmaSet / LemmaTrie:      {:.3f}s".format(after)
+    print "speedup:                   {:.1f}x".format(before / after)
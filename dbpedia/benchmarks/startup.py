@@ -0,0 +1,41 @@
+# coding: utf-8
+
+"""
+Startup benchmark: time and peak memory of installing the application and
+loading its templates, with the domains of `settings.DOMAINS`, in a fresh
+interpreter.
+
+    python -m benchmarks.startup
+"""
+
+import sys
+import json
+import subprocess
+
+_child = """
+import json, resource, time
+start = time.time()
+from dbpedia.app import install
+app = install()
+installed = time.time()
+app.load()
+loaded = time.time()
+print json.dumps({
+    "install": installed - start,
+    "load": loaded - installed,
+    "templates": len(app.rules),
+    "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+})
+"""
+
+
+def measure():
+    output = subprocess.check_output([sys.executable, "-c", _child])
+    return json.loads(output.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    result = measure()
+    print "install {:.3f}s, load {:.3f}s, {} templates, {}MB".format(
+        result["install"], result["load"], result["templates"],
+        result["maxrss_kb"] / 1024)
@@ -0,0 +1,40 @@
+# coding: utf-8
+
+"""
+Tagging benchmark: quepy's tagger against `NltkTagger` on the template
+docstring questions. Checks that both produce the same words.
+
+    python -m benchmarks.tagging
+"""
+
+import dbpedia
+from dbpedia import settings
+from dbpedia.app import install
+from dbpedia.tagging import QuepyTagger, NltkTagger
+from benchmarks import template_questions, best_of
+
+
+def as_text(tagged):
+    return [[unicode(word) for word in words] for words in tagged]
+
+
+if __name__ == "__main__":
+    app = install()
+    app.load()
+    questions = [question for _, question in template_questions(dbpedia)]
+
+    quepy_tagger = QuepyTagger(settings.NLTK_DATA_PATH)
+    nltk_tagger = NltkTagger(settings.NLTK_DATA_PATH)
+
+    expected = as_text(quepy_tagger(x) for x in questions)
+    assert as_text(nltk_tagger(x) for x in questions) == expected
+
+    words = sum(len(x) for x in expected)
+    print "{} questions, {} words".format(len(questions), words)
+
+    before = best_of(lambda: [quepy_tagger(x) for x in questions], 3)
+    after = best_of(lambda: [nltk_tagger(x) for x in questions])
+    for name, elapsed in [("quepy tagger", before),
+                          ("NltkTagger", after)]:
+        print "{:<12} {:.3f}s, {:.2f}ms per question, {:.1f}x".format(
+            name, elapsed, elapsed * 1000 / len(questions), before / elapsed)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Builds the label to URI index for DBpedia quepy from the DBpedia dumps.
+
+Takes the English labels dump and optionally the instance types one, as
+N-Triples (possibly .bz2), and writes the index to the given path (defaults
+to settings.LABEL_INDEX). Both dumps are held in memory while building.
+
+    python build_label_index.py labels_en.nt.bz2
+        [--types instance_types_en.nt.bz2] [--output labels.idx]
+"""
+
+import sys
+import argparse
+
+from dbpedia import settings
+from dbpedia.labels import build_label_index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("labels")
+    parser.add_argument("--types")
+    parser.add_argument("--output", default=settings.LABEL_INDEX)
+    args = parser.parse_args()
+
+    if args.output is None:
+        sys.exit("No --output given and settings.LABEL_INDEX is None")
+
+    count = build_label_index(args.labels, args.output, args.types)
+    print "Wrote {} labels to {}".format(count, args.output)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Builds the synonym lexicon snapshot for DBpedia quepy.
+
+Loading every domain module expands every synonym the templates use, those
+expansions are then recomputed from WordNet and written to the path given
+as argument (defaults to settings.SYNONYMS_LEXICON).
+
+    python build_lexicon.py [path]
+"""
+
+import sys
+from importlib import import_module
+
+import dbpedia
+from dbpedia import settings
+from dbpedia.lexicon import build_lexicon
+from dbpedia.synonyms import Synonyms
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        path = settings.SYNONYMS_LEXICON
+
+    for domain in dbpedia.ALL_DOMAINS:
+        import_module("dbpedia.{0}".format(domain))
+    count = build_lexicon(sorted(Synonyms.requested), path)
+    print "Wrote {} expansions to {}".format(count, path)
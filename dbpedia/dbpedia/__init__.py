@@ -9,16 +9,24 @@
 
 """
 DBpedia quepy.
+
+The question templates live in one module per domain. Importing the
+package imports the ones enabled in settings.DOMAINS, as the star imports
+did, so `quepy.install("dbpedia")` finds them.
 """
 
-from basic import *
-from music import *
-from movies import *
-from people import *
-from country import *
-from populated_place import *
-from tvshows import *
-from writers import *
-from football import *
-from language import *
+from importlib import import_module
+
+from settings import DOMAINS
+
+# Every domain module, in the order their names used to be star imported
+# (later modules shadow same-named templates of earlier ones).
+ALL_DOMAINS = ["basic", "music", "movies", "people", "country",
+               "populated_place", "tvshows", "writers", "football",
+               "language"]
 
+for _domain in sorted(DOMAINS, key=ALL_DOMAINS.index):
+    _module = import_module("{0}.{1}".format(__name__, _domain))
+    for _name in dir(_module):
+        if not _name.startswith("_"):
+            globals()[_name] = getattr(_module, _name)
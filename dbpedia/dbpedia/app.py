@@ -0,0 +1,167 @@
+# coding: utf-8
+
+"""
+DBpedia quepy application.
+"""
+
+import logging
+import threading
+from importlib import import_module
+
+from quepy import QuepyApp
+from quepy.quepyapp import question_sanitize
+from quepy.tagger import TaggingError
+from quepy.encodingpolicy import encoding_flexible_conversion
+
+from cache import LRUCache, canonical_question
+from generation import get_code
+from labels import open_label_index
+from tagging import get_tagger
+from template_index import TemplateIndex
+from timing import NULL_TIMINGS
+
+logger = logging.getLogger("dbpedia.app")
+
+
+class DBpediaApp(QuepyApp):
+    """
+    `QuepyApp` that only tries the templates whose required words appear
+    in the question (see `template_index.py`) and remembers the queries
+    of recent questions.
+    """
+
+    def __init__(self, parsing, settings):
+        self.use_index = getattr(settings, "TEMPLATE_INDEX", False)
+        self.index = None
+        self.labels_path = getattr(settings, "LABEL_INDEX", None)
+        self.labels = None
+
+        self.compiled = None
+        cache_size = getattr(settings, "COMPILE_CACHE_SIZE", 0)
+        if cache_size:
+            self.compiled = LRUCache(cache_size)
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+        super(DBpediaApp, self).__init__(parsing, settings)
+        self.tagger = get_tagger(getattr(settings, "TAGGER", "quepy"),
+                                 getattr(settings, "NLTK_DATA_PATH", None))
+
+    def load(self):
+        """
+        Indexes the templates, opens the label index and warms up the
+        tagger. Runs on the first question, call it beforehand to pay the
+        cost upfront.
+        """
+
+        if self._loaded:
+            return
+
+        with self._load_lock:
+            if self._loaded:
+                return
+
+            if self.use_index:
+                self.index = TemplateIndex(self.rules)
+            self.labels = open_label_index(self.labels_path)
+
+            # The tagger loads NLTK corpora on first use and their lazy
+            # loader isn't thread safe, load them here.
+            self.tagger(u"warm up")
+            self._loaded = True
+
+    def get_template(self, name):
+        """
+        Returns the enabled template whose class is called `name`.
+        """
+
+        self.load()
+        for rule in self.rules:
+            if type(rule).__name__ == name:
+                return rule
+        raise KeyError(u"No template called {0}".format(name))
+
+    def get_query(self, question, timings=NULL_TIMINGS):
+        """
+        Like `QuepyApp.get_query`, questions differing only in whitespace
+        or trailing punctuation share the cached result, "no template
+        matched" included. The time spent in each stage is added
+        to `timings` (see `timing.py`).
+        """
+
+        if self.compiled is None:
+            return self._get_query(question, timings)
+
+        key = canonical_question(question)
+        compiled = self.compiled.get(key)
+        if compiled is None:
+            compiled = self._get_query(question, timings)
+            self.compiled.set(key, compiled)
+        else:
+            timings.note(compile_cached=True)
+        return compiled
+
+    def _get_query(self, question, timings):
+        question = question_sanitize(question)
+        for target, query, userdata in self.get_queries(question, timings):
+            return target, query, userdata
+        return None, None, None
+
+    def get_queries(self, question, timings=NULL_TIMINGS):
+        question = encoding_flexible_conversion(question)
+        for expression, userdata in self._iter_compiled_forms(question,
+                                                              timings):
+            with timings.stage("compilation"):
+                target, query = get_code(expression, self.language,
+                                         self.labels)
+            message = u"Interpretation {1}: {0}"
+            logger.debug(message.format(str(expression),
+                         expression.rule_used))
+            logger.debug(u"Query generated: {0}".format(query))
+            yield target, query, userdata
+
+    def candidate_rules(self, words):
+        if self.index is None:
+            return self.rules
+        return self.index.candidates(words)
+
+    def _iter_compiled_forms(self, question, timings=NULL_TIMINGS):
+        self.load()
+
+        try:
+            with timings.stage("tagging"):
+                words = list(self.tagger(question))
+        except TaggingError:
+            logger.warning(u"Can't parse tagger's output for: '%s'",
+                           question)
+            return
+
+        # Only the first match is noted, it's the one get_query uses.
+        tried = 0
+        matched = False
+        matching = timings.stage("matching")
+        matching.start()
+        for rule in self.candidate_rules(words):
+            tried += 1
+            expression, userdata = rule.get_interpretation(words)
+            if expression:
+                matching.stop()
+                if not matched:
+                    timings.note(template=expression.rule_used,
+                                 templates_tried=tried)
+                    matched = True
+                yield expression, userdata
+                matching.start()
+        matching.stop()
+        if not matched:
+            timings.note(template=None, templates_tried=tried)
+
+
+def install(app_name="dbpedia"):
+    """
+    Like `quepy.install` but returns a `DBpediaApp`.
+    """
+
+    settings = import_module("{0}.settings".format(app_name))
+    parsing = import_module(app_name)
+    return DBpediaApp(parsing, settings)
@@ -0,0 +1,228 @@
+# coding: utf-8
+
+"""
+Queries balanced over several mirrors of the SPARQL endpoint.
+
+Each query goes to the endpoint with the fewest requests in flight.
+Endpoints failing SPARQL_EJECT_FAILURES requests in a row are ejected
+until a health check query answers again. Health checks run every
+SPARQL_HEALTH_INTERVAL seconds on the idle endpoints too, so one that
+stops answering is ejected before queries are sent to it.
+"""
+
+import time
+import socket
+import httplib
+import logging
+import threading
+
+from settings import SPARQL_EJECT_FAILURES, SPARQL_HEALTH_INTERVAL, \
+    SPARQL_HEALTH_QUERY, SPARQL_HEALTH_TIMEOUT
+from client import SparqlError, DeadlineExceeded
+from combine import query_combined
+from stream import Bindings
+
+logger = logging.getLogger("dbpedia.balancer")
+
+
+def endpoint_failed(error):
+    """
+    Whether `error` is the endpoint's fault rather than the query's or
+    the caller's deadline.
+    """
+
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, SparqlError):
+        return error.status >= 500
+    return isinstance(error, (socket.error, httplib.HTTPException))
+
+
+class Backend(object):
+    """
+    One endpoint of a `BalancedClient` and its counters.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.endpoint = client.endpoint
+        self.outstanding = 0
+        self.sent = 0
+        self.failures = 0
+        self.ejected = False
+        self.ejections = 0
+
+    def stats(self):
+        return {
+            "endpoint": self.endpoint,
+            "outstanding": self.outstanding,
+            "sent": self.sent,
+            "failures": self.failures,
+            "ejected": self.ejected,
+            "ejections": self.ejections,
+        }
+
+
+class BalancedClient(object):
+    """
+    Sends each query to the least busy of `clients` (`SparqlClient`s of
+    mirrors of the same data) that isn't ejected, or of all of them if
+    they all are. A query whose endpoint fails is sent once more to
+    another one.
+    """
+
+    def __init__(self, clients, eject_failures=SPARQL_EJECT_FAILURES,
+                 health_interval=SPARQL_HEALTH_INTERVAL,
+                 health_query=SPARQL_HEALTH_QUERY,
+                 health_timeout=SPARQL_HEALTH_TIMEOUT):
+        assert clients
+        self.backends = [Backend(client) for client in clients]
+        self.endpoint = u" ".join(sorted(x.endpoint for x in self.backends))
+        self.eject_failures = eject_failures
+        self.health_interval = health_interval
+        self.health_query = health_query
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._checker = None
+        self._turn = 0
+
+    def _pick(self, exclude=None):
+        with self._lock:
+            self._start_checker()
+            # Ties go round robin.
+            self._turn = (self._turn + 1) % len(self.backends)
+            backends = self.backends[self._turn:] + \
+                self.backends[:self._turn]
+            backends = [x for x in backends if x is not exclude]
+            available = [x for x in backends if not x.ejected]
+            if exclude is not None and not available:
+                return None
+            backend = min(available or backends, key=lambda x: x.outstanding)
+            backend.outstanding += 1
+            backend.sent += 1
+            return backend
+
+    def _done(self, backend, error=None):
+        with self._lock:
+            backend.outstanding -= 1
+            if error is None:
+                backend.failures = 0
+            elif endpoint_failed(error):
+                self._failed(backend, error)
+
+    def _failed(self, backend, error):
+        backend.failures += 1
+        if backend.failures >= self.eject_failures:
+            self._eject(backend, error)
+
+    def _eject(self, backend, error):
+        # Only health checks re-admit endpoints.
+        if backend.ejected or not self.health_interval:
+            return
+        backend.ejected = True
+        backend.ejections += 1
+        logger.warning(u"Ejected {0}: {1}".format(backend.endpoint, error))
+
+    def _send(self, method, query, deadline):
+        backend = self._pick()
+        try:
+            results = getattr(backend.client, method)(query, deadline)
+        except Exception as error:
+            self._done(backend, error)
+            if not endpoint_failed(error):
+                raise
+            retry = self._pick(exclude=backend)
+            if retry is None:
+                raise
+            backend = retry
+            try:
+                results = getattr(backend.client, method)(query, deadline)
+            except Exception as error:
+                self._done(backend, error)
+                raise
+        return backend, results
+
+    def query(self, query, deadline=None):
+        backend, results = self._send("query", query, deadline)
+        self._done(backend)
+        return results
+
+    def query_many(self, queries, deadline=None):
+        return query_combined(self, queries, deadline)
+
+    def query_stream(self, query, deadline=None):
+        """
+        Like `SparqlClient.query_stream`, the endpoint counts as busy
+        until the bindings are read.
+        """
+
+        backend, results = self._send("query_stream", query, deadline)
+        bindings = results["results"]["bindings"]
+        results["results"]["bindings"] = Bindings(
+            self._iter_bindings(backend, bindings))
+        return results
+
+    def _iter_bindings(self, backend, bindings):
+        error = None
+        try:
+            for binding in bindings:
+                yield binding
+        except Exception as error:
+            raise
+        finally:
+            self._done(backend, error)
+
+    def check(self):
+        """
+        Sends the health check query to the endpoints that are ejected
+        or idle, ejecting those that fail and re-admitting those that
+        answer. Busy endpoints are checked by the queries they get.
+        """
+
+        for backend in self.backends:
+            if backend.outstanding and not backend.ejected:
+                continue
+            deadline = time.time() + self.health_timeout
+            try:
+                backend.client.query(self.health_query, deadline)
+            except Exception as error:
+                if isinstance(error, SparqlError) and error.status < 500:
+                    error = None
+            else:
+                error = None
+
+            with self._lock:
+                if error is not None:
+                    self._eject(backend, error)
+                elif backend.ejected:
+                    backend.ejected = False
+                    backend.failures = 0
+                    logger.warning(u"Re-admitted {0}".format(
+                        backend.endpoint))
+
+    def _start_checker(self):
+        if self._checker is not None or not self.health_interval:
+            return
+        self._checker = threading.Thread(target=self._check_forever,
+                                         name="sparql-health")
+        self._checker.daemon = True
+        self._checker.start()
+
+    def _check_forever(self):
+        while not self._stopped.wait(self.health_interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Health check failed")
+
+    def stats(self):
+        with self._lock:
+            return [backend.stats() for backend in self.backends]
+
+    def close(self):
+        self._stopped.set()
+        if self._checker is not None:
+            self._checker.join()
+        for backend in self.backends:
+            backend.client.close()
@@ -0,0 +1,361 @@
+# coding: utf-8
+
+"""
+Caches of compiled questions and of SPARQL results.
+"""
+
+import re
+import sys
+import time
+import shelve
+import hashlib
+import threading
+from collections import OrderedDict
+
+from quepy.encodingpolicy import encoding_flexible_conversion
+
+from settings import SPARQL_CACHE_SIZE, SPARQL_CACHE_PATH, \
+    SPARQL_CACHE_TTL, SPARQL_CACHE_MAX_BINDINGS
+from stream import Bindings
+from executor import SingleFlight, FlightTimeout
+from client import DeadlineExceeded, time_left
+
+# Quoted literals are kept verbatim, everything else is split on spaces.
+_query_tokens = re.compile(r'"(?:[^"\\]|\\.)*"|\S+')
+
+_trailing_punctuation = re.compile(r"[\s?.!]+$", re.UNICODE)
+
+
+def canonical_question(question):
+    """
+    Returns `question` with its whitespace collapsed and without trailing
+    punctuation. Case is kept, it changes the labels in the query.
+    """
+
+    question = encoding_flexible_conversion(question)
+    question = u" ".join(question.split())
+    return _trailing_punctuation.sub(u"", question)
+
+
+def normalize_query(query):
+    """
+    Returns `query` with its whitespace collapsed, outside string literals.
+    """
+
+    return u" ".join(_query_tokens.findall(query))
+
+
+def cache_key(query, endpoint):
+    key = u"{0}\n{1}".format(endpoint, normalize_query(query))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class LRUCache(object):
+    """
+    Thread safe mapping keeping the `size` most recently used items.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the value stored for `key` or None.
+        """
+
+        with self._lock:
+            value = self._items.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._items),
+        }
+
+
+class ResultCache(object):
+    """
+    Keeps the results of up to `size` queries in memory, evicting the least
+    recently used ones. If `path` is given results are also stored in a
+    shelve file there, so they survive restarts. Entries expire after the
+    TTL of their query type in `ttls` (seconds, None key for the default).
+    """
+
+    def __init__(self, size=SPARQL_CACHE_SIZE, path=SPARQL_CACHE_PATH,
+                 ttls=SPARQL_CACHE_TTL):
+        self.size = size
+        self.path = path
+        self.ttls = ttls
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._memory = OrderedDict()
+        self._disk = None
+        if path is not None:
+            self._disk = shelve.open(path, protocol=2)
+        self._lock = threading.Lock()
+
+    def ttl(self, query_type):
+        return self.ttls.get(query_type, self.ttls.get(None))
+
+    def get(self, query, endpoint):
+        """
+        Returns the cached results of `query` on `endpoint` or None.
+        """
+
+        key = cache_key(query, endpoint)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            from_disk = False
+            if entry is None and self._disk is not None:
+                entry = self._disk.get(key)
+                from_disk = entry is not None
+
+            if entry is not None and entry[0] <= now:
+                if from_disk:
+                    del self._disk[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._remember(key, entry)
+            self.hits += 1
+            if from_disk:
+                self.disk_hits += 1
+            return entry[1]
+
+    def set(self, query, endpoint, results, query_type=None):
+        ttl = self.ttl(query_type)
+        if not ttl:
+            return
+
+        key = cache_key(query, endpoint)
+        entry = (time.time() + ttl, results)
+
+        with self._lock:
+            self._remember(key, entry)
+            if self._disk is not None:
+                self._disk[key] = entry
+                self._disk.sync()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        while len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "size": len(self._memory),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+
+class CachedClient(object):
+    """
+    Wraps a SPARQL client so queries are answered from `cache` when
+    possible. Streamed results are cached once read if they have at most
+    `max_bindings` bindings. Queries are sent once while in flight, the
+    callers asking for them meanwhile share the results (see
+    `flights.stats()`). Those of a stream are shared once it's read, if
+    it's small enough to be cached.
+    """
+
+    def __init__(self, client, cache, max_bindings=SPARQL_CACHE_MAX_BINDINGS):
+        self.client = client
+        self.cache = cache
+        self.max_bindings = max_bindings
+        self.endpoint = client.endpoint
+        self.flights = SingleFlight()
+
+    def query(self, query, query_type=None, deadline=None):
+        """
+        Returns the results of `query`, raising `client.DeadlineExceeded`
+        once `deadline` is passed, also while waiting on the same query
+        sent by another caller. If that caller's own deadline passes
+        first, the query is sent again.
+        """
+
+        results = self.cache.get(query, self.endpoint)
+        key = cache_key(query, self.endpoint)
+        while results is None:
+            try:
+                results = self.flights.do(key, self._fetch,
+                                          (query, query_type, deadline),
+                                          time_left(deadline))
+            except FlightTimeout:
+                raise DeadlineExceeded("Deadline exceeded waiting for the "
+                                       "same query in flight")
+            except DeadlineExceeded:
+                # Raises if it's this caller's deadline.
+                time_left(deadline)
+        return results
+
+    def _fetch(self, query, query_type, deadline):
+        results = self.client.query(query, deadline)
+        self.cache.set(query, self.endpoint, results, query_type)
+        return results
+
+    def _wait(self, flight, deadline):
+        try:
+            return self.flights.wait(flight, time_left(deadline))
+        except FlightTimeout:
+            raise DeadlineExceeded("Deadline exceeded waiting for the "
+                                   "same query in flight")
+
+    def query_many(self, queries, query_types=None, deadline=None):
+        """
+        Returns a `(results, error)` pair per query of `queries`, where
+        `error` is the `sys.exc_info()` of its failure or None, sending
+        the ones not cached nor in flight together.
+        """
+
+        if query_types is None:
+            query_types = [None] * len(queries)
+
+        answers = [(self.cache.get(query, self.endpoint), None)
+                   for query in queries]
+        flights = {}
+        for i, (results, _) in enumerate(answers):
+            if results is None:
+                key = cache_key(queries[i], self.endpoint)
+                flights[i] = (key,) + self.flights.join(key)
+        led = [i for i in sorted(flights) if flights[i][2]]
+
+        if led:
+            try:
+                sent = self.client.query_many([queries[i] for i in led],
+                                              deadline)
+            except Exception:
+                error = sys.exc_info()
+                for i in led:
+                    self.flights.land(flights[i][0], flights[i][1],
+                                      error=error)
+                raise error[0], error[1], error[2]
+            for i, (results, error) in zip(led, sent):
+                key, flight, _ = flights[i]
+                if error is None:
+                    self.cache.set(queries[i], self.endpoint, results,
+                                   query_types[i])
+                    self.flights.land(key, flight, results)
+                else:
+                    self.flights.land(key, flight, error=error)
+                answers[i] = (results, error)
+
+        for i in sorted(flights):
+            key, flight, leader = flights[i]
+            if leader:
+                continue
+            try:
+                results = self._wait(flight, deadline)
+            except DeadlineExceeded:
+                # Sent again below unless it's this caller's deadline.
+                results = None
+            except Exception:
+                answers[i] = (None, sys.exc_info())
+                continue
+            try:
+                if results is None:
+                    results = self.query(queries[i], query_types[i],
+                                         deadline)
+                answers[i] = (results, None)
+            except Exception:
+                answers[i] = (None, sys.exc_info())
+        return answers
+
+    def query_stream(self, query, query_type=None, deadline=None):
+        """
+        Like `query` but the bindings are decoded as they're read. The
+        callers asking for a query being streamed wait until it's read.
+        """
+
+        results = self.cache.get(query, self.endpoint)
+        key = cache_key(query, self.endpoint)
+        while results is None:
+            flight, leader = self.flights.join(key)
+            if leader:
+                return self._stream(key, flight, query, query_type,
+                                    deadline)
+            try:
+                results = self._wait(flight, deadline)
+            except DeadlineExceeded:
+                time_left(deadline)
+            # None if it wasn't small enough to keep, it's sent again.
+        return results
+
+    def _stream(self, key, flight, query, query_type, deadline):
+        try:
+            results = self.client.query_stream(query, deadline)
+        except Exception:
+            error = sys.exc_info()
+            self.flights.land(key, flight, error=error)
+            raise error[0], error[1], error[2]
+
+        bindings = self._cache_stream(key, flight, query, query_type,
+                                      results["results"]["bindings"])
+        results["results"]["bindings"] = Bindings(bindings)
+        return results
+
+    def _cache_stream(self, key, flight, query, query_type, bindings):
+        kept = []
+        landed = False
+        try:
+            for binding in bindings:
+                if kept is not None:
+                    kept.append(binding)
+                    if len(kept) > self.max_bindings:
+                        # Too many to share, the others send it again.
+                        kept = None
+                        self.flights.land(key, flight)
+                        landed = True
+                yield binding
+
+            if kept is not None:
+                results = {"head": {}, "results": {"bindings": kept}}
+                self.cache.set(query, self.endpoint, results, query_type)
+                self.flights.land(key, flight, results)
+                landed = True
+        except Exception:
+            error = sys.exc_info()
+            if not landed:
+                self.flights.land(key, flight, error=error)
+                landed = True
+            raise error[0], error[1], error[2]
+        finally:
+            # Not landed yet if left unread, the others send it again.
+            if not landed:
+                self.flights.land(key, flight)
+
+    def close(self):
+        self.client.close()
+        self.cache.close()
@@ -0,0 +1,219 @@
+# coding: utf-8
+
+"""
+Thread safe SPARQL client keeping HTTP connections alive in a pool.
+"""
+
+import json
+import socket
+import httplib
+import logging
+from Queue import Queue, Empty, Full
+from urllib import urlencode
+from urlparse import urlsplit
+
+from settings import SPARQL_ENDPOINT, SPARQL_POOL_SIZE, SPARQL_TIMEOUT
+from stream import iter_bindings, Bindings
+from deadline import DeadlineExceeded, time_left
+from combine import query_combined
+
+logger = logging.getLogger("dbpedia.client")
+
+_connection_classes = {
+    "http": httplib.HTTPConnection,
+    "https": httplib.HTTPSConnection,
+}
+
+# Errors meaning a kept alive connection was closed by the server, the
+# request is retried once on a new connection.
+_stale_errors = (httplib.BadStatusLine, httplib.CannotSendRequest,
+                 socket.error)
+
+# Bytes read at a time from streamed responses.
+CHUNK_SIZE = 64 * 1024
+
+
+class SparqlError(Exception):
+    """
+    The endpoint answered with an error status.
+    """
+
+    def __init__(self, status, reason, body):
+        message = u"{0} {1}: {2}".format(status, reason, body[:200])
+        super(SparqlError, self).__init__(message)
+        self.status = status
+        self.reason = reason
+        self.body = body
+
+
+class SparqlClient(object):
+    """
+    Sends SPARQL queries to `endpoint` and returns the decoded JSON
+    results. Shareable across threads: at most `pool_size` connections
+    are open at once and they are reused between queries.
+
+    Every socket operation gives up after `timeout` seconds, or once the
+    `deadline` of the query is passed if that comes first.
+    """
+
+    def __init__(self, endpoint=SPARQL_ENDPOINT, pool_size=SPARQL_POOL_SIZE,
+                 timeout=SPARQL_TIMEOUT):
+        url = urlsplit(endpoint)
+        if url.scheme not in _connection_classes:
+            message = u"Unsupported SPARQL endpoint {0!r}"
+            raise ValueError(message.format(endpoint))
+
+        self.endpoint = endpoint
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._connection_class = _connection_classes[url.scheme]
+        self._host = url.netloc
+        self._path = url.path or "/"
+        self._idle = Queue(pool_size)
+        self._slots = Queue(pool_size)
+        for _ in xrange(pool_size):
+            self._slots.put_nowait(None)
+
+    def _connect(self):
+        return self._connection_class(self._host, timeout=self.timeout)
+
+    def _timeout(self, deadline):
+        left = time_left(deadline)
+        if left is None or (self.timeout is not None and
+                            self.timeout < left):
+            return self.timeout
+        return left
+
+    def _set_timeout(self, connection, deadline):
+        connection.timeout = self._timeout(deadline)
+        if connection.sock is not None:
+            connection.sock.settimeout(connection.timeout)
+
+    def _acquire(self, deadline=None):
+        try:
+            self._slots.get(True, time_left(deadline))
+        except Empty:
+            raise DeadlineExceeded("Deadline exceeded waiting for a "
+                                   "connection to {0}".format(self.endpoint))
+        try:
+            return self._idle.get_nowait(), True
+        except Empty:
+            return self._connect(), False
+
+    def _release(self, connection, reusable):
+        if reusable:
+            try:
+                self._idle.put_nowait(connection)
+                connection = None
+            except Full:
+                pass
+        if connection is not None:
+            connection.close()
+        self._slots.put_nowait(None)
+
+    def _request(self, connection, body, deadline):
+        self._set_timeout(connection, deadline)
+        headers = {
+            "Accept": "application/sparql-results+json",
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        connection.request("POST", self._path, body, headers)
+        return connection.getresponse()
+
+    def _send(self, query, deadline=None):
+        """
+        Sends `query` and returns the connection and the response, whose
+        body is still to be read. The connection must be released.
+        """
+
+        if isinstance(query, unicode):
+            query = query.encode("utf-8")
+        body = urlencode({"query": query})
+
+        connection, reused = self._acquire(deadline)
+        response = None
+        try:
+            try:
+                response = self._request(connection, body, deadline)
+            except _stale_errors as error:
+                if not reused or isinstance(error, socket.timeout):
+                    raise
+                logger.debug(u"Reconnecting to {0}".format(self.endpoint))
+                connection.close()
+                connection = self._connect()
+                response = self._request(connection, body, deadline)
+        except socket.timeout:
+            time_left(deadline)
+            raise
+        finally:
+            if response is None:
+                self._release(connection, False)
+        return connection, response
+
+    def _read(self, connection, response, deadline=None):
+        data = "".join(self._read_chunks(connection, response, deadline))
+        if response.status != httplib.OK:
+            raise SparqlError(response.status, response.reason, data)
+        return data
+
+    def _read_chunks(self, connection, response, deadline=None):
+        reusable = False
+        try:
+            while True:
+                if deadline is not None:
+                    self._set_timeout(connection, deadline)
+                try:
+                    chunk = response.read(CHUNK_SIZE)
+                except socket.timeout:
+                    # The deadline, rather than the timeout, if it passed.
+                    time_left(deadline)
+                    raise
+                if not chunk:
+                    break
+                yield chunk
+            reusable = not response.will_close
+        finally:
+            self._release(connection, reusable)
+
+    def query(self, query, deadline=None):
+        """
+        Runs `query` and returns its results as decoded JSON.
+        """
+
+        connection, response = self._send(query, deadline)
+        return json.loads(self._read(connection, response, deadline))
+
+    def query_many(self, queries, deadline=None):
+        """
+        Returns a `(results, error)` pair per query of `queries`, sending
+        them in one request when possible, see `combine.query_combined`.
+        """
+
+        return query_combined(self, queries, deadline)
+
+    def query_stream(self, query, deadline=None):
+        """
+        Like `query` but the bindings are decoded as they arrive, see
+        `stream.Bindings`. The connection is busy until they are all read
+        and closed if they are dropped before.
+        """
+
+        connection, response = self._send(query, deadline)
+        if response.status != httplib.OK:
+            self._read(connection, response, deadline)
+
+        chunks = self._read_chunks(connection, response, deadline)
+        bindings = Bindings(iter_bindings(chunks))
+        return {"head": {}, "results": {"bindings": bindings}}
+
+    def close(self):
+        """
+        Closes the idle connections.
+        """
+
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
@@ -0,0 +1,236 @@
+# coding: utf-8
+
+"""
+Several SELECT queries answered by a single request. Each query runs as
+a subquery in its own branch of a UNION, tagged with its position, and
+the bindings are split back out by that tag, so every query gets the
+same bindings it gets when sent alone.
+"""
+
+import re
+import sys
+import time
+import logging
+from collections import OrderedDict
+
+from deadline import DeadlineExceeded, time_left
+
+logger = logging.getLogger("dbpedia.combine")
+
+# Variable holding the position of the query each binding answers.
+TAG = "combined"
+
+_select = re.compile(r"\bSELECT\b", re.I)
+_prefix = re.compile(r"^\s*PREFIX\s+([\w.-]*:)\s*<([^>]*)>\s*$", re.I)
+_projection = re.compile(r"^SELECT\s+(?:DISTINCT\s+|REDUCED\s+)?(.*?)\bWHERE\b",
+                         re.I | re.S)
+_variable = re.compile(r"[?$](\w+)")
+_combined = re.compile(r"^(.*?)\nSELECT \* WHERE \{\n(.*)\n\}\n$", re.S)
+_branch = re.compile(r"  \{\n    \{ (.*?) \}\n    BIND\((\d+) AS \?" + TAG +
+                     r"\)\n  \}", re.S)
+
+
+def split_query(query):
+    """
+    Returns the `{prefix: namespace}` declarations of `query`, in order,
+    and the SELECT query that follows them, or None if anything else
+    comes before the SELECT.
+    """
+
+    match = _select.search(query)
+    if match is None:
+        return None
+
+    prefixes = OrderedDict()
+    for line in query[:match.start()].splitlines():
+        if not line.strip():
+            continue
+        prefix = _prefix.match(line)
+        if prefix is None:
+            return None
+        prefixes[prefix.group(1)] = prefix.group(2)
+    return prefixes, query[match.start():].strip()
+
+
+def combine_queries(queries):
+    """
+    Returns a query answering all of `queries`, or None if they can't be
+    combined (they aren't plain SELECT queries, declare a prefix
+    differently or use the tag variable). The prefixes are declared in
+    the order the queries declare them, so queries declaring the same
+    ones are given back as they were by `uncombine_query`.
+    """
+
+    prefixes = OrderedDict()
+    branches = []
+    for index, query in enumerate(queries):
+        parts = split_query(query)
+        if parts is None:
+            return None
+        declared, select = parts
+        for prefix, namespace in declared.iteritems():
+            if prefixes.setdefault(prefix, namespace) != namespace:
+                return None
+        if TAG in _variable.findall(select):
+            return None
+        branches.append(u"  {{\n    {{ {0} }}\n    BIND({1} AS ?{2})\n  }}"
+                        .format(select, index, TAG))
+
+    prologue = u"".join(u"PREFIX {0} <{1}>\n".format(prefix, namespace)
+                        for prefix, namespace in prefixes.iteritems())
+    return u"{0}\nSELECT * WHERE {{\n{1}\n}}\n".format(
+        prologue, u"\n  UNION\n".join(branches))
+
+
+def uncombine_query(query):
+    """
+    Returns the queries combined into `query` by `combine_queries`, each
+    declaring all the prefixes `query` declares, or None if it isn't a
+    combined query.
+    """
+
+    match = _combined.match(query)
+    if match is None:
+        return None
+    prologue, body = match.groups()
+    queries = []
+    for index, branch in enumerate(_branch.finditer(body)):
+        if int(branch.group(2)) != index:
+            return None
+        queries.append(u"{0}\n{1}\n".format(prologue, branch.group(1)))
+    return queries or None
+
+
+def projected_variables(query):
+    match = _projection.search(split_query(query)[1])
+    return _variable.findall(match.group(1))
+
+
+def split_results(results, queries):
+    """
+    Returns the results of each of `queries` out of `results`, the
+    results of their combined query.
+    """
+
+    bindings = [[] for _ in queries]
+    for binding in results["results"]["bindings"]:
+        index = int(binding.pop(TAG)["value"])
+        bindings[index].append(binding)
+
+    return [{
+        "head": dict(results["head"], vars=projected_variables(query)),
+        "results": dict(results["results"], bindings=bindings[index]),
+    } for index, query in enumerate(queries)]
+
+
+def query_combined(client, queries, deadline=None):
+    """
+    Returns a `(results, error)` pair per query of `queries`, where
+    `error` is the `sys.exc_info()` of its failure or None. They're sent
+    in one request if they can be combined. If that request fails they
+    are sent one by one, so a failing query doesn't fail the others.
+    None of them is sent after `deadline`.
+    """
+
+    combined = None
+    if len(queries) > 1:
+        combined = combine_queries(queries)
+
+    if combined is not None:
+        try:
+            results = client.query(combined, deadline)
+            return [(x, None) for x in split_results(results, queries)]
+        except Exception as error:
+            logger.warning(u"Combined query of {0} queries failed, sending "
+                           u"them alone: {1}".format(len(queries), error))
+
+    answers = []
+    for query in queries:
+        try:
+            answers.append((client.query(query, deadline), None))
+        except Exception:
+            answers.append((None, sys.exc_info()))
+    return answers
+
+
+class CombinedTask(object):
+    """
+    The results of one query of a submitted `QueryBatch`, with the
+    interface of `executor.Task`.
+    """
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    def done(self):
+        return self.batch.task.done()
+
+    def wait(self, timeout=None):
+        return self.batch.task.wait(timeout)
+
+    def result(self, timeout=None):
+        results, error = self.batch.task.result(timeout)[self.index]
+        if error is not None:
+            raise error[0], error[1], error[2]
+        return results
+
+
+class QueryBatch(object):
+    """
+    Queries sent together once `submit` is called. The tasks returned
+    by `add` can't be waited on before that.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.query_types = []
+        self.timings = []
+        self.deadlines = []
+        self.task = None
+
+    def __len__(self):
+        return len(self.queries)
+
+    def add(self, query, query_type=None, timings=None, deadline=None):
+        """
+        Adds `query` to the batch. The batch is sent with the latest
+        deadline of its queries, and `query` fails with `DeadlineExceeded`
+        if it's answered after its own `deadline`.
+        """
+
+        self.queries.append(query)
+        self.query_types.append(query_type)
+        self.timings.append(timings)
+        self.deadlines.append(deadline)
+        return CombinedTask(self, len(self.queries) - 1)
+
+    def submit(self, pool, client):
+        """
+        Submits the batch to `pool`, sent by `client.query_many`.
+        """
+
+        self.task = pool.submit(self._run, client)
+
+    def _run(self, client):
+        deadline = None
+        if self.deadlines and None not in self.deadlines:
+            deadline = max(self.deadlines)
+        start = time.time()
+        answers = client.query_many(self.queries, self.query_types, deadline)
+        elapsed = time.time() - start
+        for timings in self.timings:
+            if timings is not None:
+                timings.add("http", elapsed)
+                timings.note(combined_queries=len(self.queries))
+        return [self._in_time(answer, deadline)
+                for answer, deadline in zip(answers, self.deadlines)]
+
+    def _in_time(self, answer, deadline):
+        results, error = answer
+        if error is None:
+            try:
+                time_left(deadline)
+            except DeadlineExceeded:
+                return None, sys.exc_info()
+        return answer
@@ -0,0 +1,28 @@
+# coding: utf-8
+
+"""
+Deadlines of questions, as `time.time()` values.
+"""
+
+import time
+import socket
+
+
+class DeadlineExceeded(socket.timeout):
+    """
+    The deadline of a query passed before it was answered.
+    """
+
+
+def time_left(deadline):
+    """
+    Seconds left until `deadline` (a `time.time()`), None if there's no
+    deadline. Raises `DeadlineExceeded` once it's passed.
+    """
+
+    if deadline is None:
+        return None
+    left = deadline - time.time()
+    if left <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+    return left
@@ -18,6 +18,25 @@ HasKeyword.relation = "rdfs:label"
 HasKeyword.language = "en"
 
 
+class InLanguage(object):
+    """
+    Relation from a literal to the language it must be in, generated as a
+    FILTER by generation.py.
+    """
+
+
+class FixedLanguageRelation(FixedRelation):
+    """
+    Fixed relation to literals, only those in `HasKeyword.language` are
+    kept by the endpoint.
+    """
+
+    def __init__(self, destination, reverse=None):
+        super(FixedLanguageRelation, self).__init__(destination, reverse)
+        if HasKeyword.language:
+            self.add_data(InLanguage, HasKeyword.language)
+
+
 class IsPerson(FixedType):
     fixedtype = "foaf:Person"
 
@@ -68,12 +87,12 @@ class HasName(FixedDataRelation):
     language = "en"
 
 
-class DefinitionOf(FixedRelation):
+class DefinitionOf(FixedLanguageRelation):
     relation = "rdfs:comment"
     reverse = True
 
 
-class LabelOf(FixedRelation):
+class LabelOf(FixedLanguageRelation):
     relation = "rdfs:label"
     reverse = True
 
@@ -165,7 +184,7 @@ class NumberOfEpisodesIn(FixedRelation):
     reverse = True
 
 
-class ShowNameOf(FixedRelation):
+class ShowNameOf(FixedLanguageRelation):
      # relation = "dbpprop:showName"
     relation = "foaf:name"
     reverse = True
@@ -182,7 +201,7 @@ class CreatorOf(FixedRelation):
     reverse = True
 
 
-class NameOf(FixedRelation):
+class NameOf(FixedLanguageRelation):
     # relation = "dbpprop:name"
     relation = "foaf:name" 
     reverse = True
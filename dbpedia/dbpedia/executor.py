@@ -0,0 +1,288 @@
+# coding: utf-8
+
+"""
+Bounded thread pool used to run SPARQL queries concurrently, and the
+coalescing of identical queries in flight.
+"""
+
+import sys
+import threading
+from Queue import Queue
+from collections import deque
+
+
+class Task(object):
+    """
+    The pending result of a function submitted to a `WorkerPool`.
+    """
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+
+    def run(self):
+        try:
+            self._value = self.function(*self.args)
+        except Exception:
+            self._error = sys.exc_info()
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """
+        Waits for the task and returns its value, re-raising whatever it
+        raised.
+        """
+
+        if not self.wait(timeout):
+            raise RuntimeError("Task didn't finish in {0}s".format(timeout))
+        if self._error is not None:
+            raise self._error[0], self._error[1], self._error[2]
+        return self._value
+
+
+class DeferredTask(object):
+    """
+    A function submitted to `pool` only once `start` is called or its
+    result is waited on, with the interface of `Task`. `on_start` is
+    called when it's submitted.
+    """
+
+    def __init__(self, pool, function, args, on_start=None):
+        self._pool = pool
+        self._function = function
+        self._args = args
+        self._on_start = on_start
+        self._task = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._task is None:
+                if self._on_start is not None:
+                    self._on_start()
+                self._task = self._pool.submit(self._function, *self._args)
+            return self._task
+
+    def started(self):
+        return self._task is not None
+
+    def done(self):
+        return self._task is not None and self._task.done()
+
+    def wait(self, timeout=None):
+        return self.start().wait(timeout)
+
+    def result(self, timeout=None):
+        return self.start().result(timeout)
+
+
+class Gate(object):
+    """
+    Submits tasks to `pool` while fewer than `limit` of them are held,
+    the others as `release` makes room for them, in order, or as soon as
+    they're waited on. Each task is held from its submission until
+    `release` is called for it.
+    """
+
+    def __init__(self, pool, limit):
+        self.pool = pool
+        self.limit = limit
+        self.held = 0
+        self._waiting = deque()
+        self._lock = threading.Lock()
+
+    def _hold(self):
+        with self._lock:
+            self.held += 1
+
+    def submit(self, function, *args):
+        task = DeferredTask(self.pool, function, args, self._hold)
+        with self._lock:
+            if self.held >= self.limit:
+                self._waiting.append(task)
+                return task
+        task.start()
+        return task
+
+    def release(self):
+        with self._lock:
+            self.held -= 1
+            task = None
+            while self._waiting and self.held < self.limit:
+                task = self._waiting.popleft()
+                if not task.started():
+                    break
+                task = None
+        if task is not None:
+            task.start()
+
+
+class WorkerPool(object):
+    """
+    A fixed number of daemon threads running submitted tasks in order of
+    submission.
+    """
+
+    def __init__(self, workers):
+        assert workers > 0
+        self.workers = workers
+        self._tasks = Queue()
+        self._threads = []
+        for i in xrange(workers):
+            thread = threading.Thread(target=self._work,
+                                      name="sparql-worker-{0}".format(i))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            task.run()
+
+    def submit(self, function, *args):
+        task = Task(function, args)
+        self._tasks.put(task)
+        return task
+
+    def close(self):
+        """
+        Lets the queued tasks finish and stops the threads.
+        """
+
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+class FlightTimeout(Exception):
+    """
+    A caller of `SingleFlight` gave up waiting on the call in flight.
+    """
+
+
+class _Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Runs one call per key at a time: callers asking for a key that is in
+    flight wait for its result, or its error, instead of calling again.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, args=(), timeout=None):
+        """
+        Returns `function(*args)`, or the result of the call for `key`
+        already in flight. Waiting on it raises `FlightTimeout` after
+        `timeout` seconds, the call itself goes on for the others.
+        """
+
+        flight, leader = self.join(key)
+        if leader:
+            try:
+                value = function(*args)
+            except Exception:
+                error = sys.exc_info()
+                self.land(key, flight, error=error)
+                raise error[0], error[1], error[2]
+            self.land(key, flight, value)
+            return value
+        return self.wait(flight, timeout)
+
+    def join(self, key):
+        """
+        Returns the flight of `key` and whether the caller leads it, in
+        which case it must `land` it once it has the result.
+        """
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+                return flight, True
+            self.coalesced += 1
+            return flight, False
+
+    def land(self, key, flight, value=None, error=None):
+        """
+        Ends the `flight` of `key` with `value`, or `error` (an
+        `exc_info` triple), for those waiting on it.
+        """
+
+        flight.value = value
+        flight.error = error
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
+
+    def wait(self, flight, timeout=None):
+        """
+        Returns the value of `flight`, re-raising its error. Raises
+        `FlightTimeout` after `timeout` seconds.
+        """
+
+        if not flight.done.wait(timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise FlightTimeout("No result in {0}s".format(timeout))
+        if flight.error is not None:
+            raise flight.error[0], flight.error[1], flight.error[2]
+        return flight.value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "in_flight": len(self._flights),
+            }
+
+
+def ordered(items, window):
+    """
+    Yields the `(item, task)` pairs of the `items` iterable in input order
+    once their task is done (`task` may be None). At most `window` pairs
+    are read ahead, so producing the next items, and submitting their
+    tasks, overlaps with the tasks already running.
+    """
+
+    pending = deque()
+    for item, task in items:
+        pending.append((item, task))
+        while len(pending) > window:
+            yield _finish(*pending.popleft())
+    while pending:
+        yield _finish(*pending.popleft())
+
+
+def _finish(item, task):
+    if task is not None:
+        task.wait()
+    return item, task
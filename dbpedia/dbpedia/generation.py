@@ -0,0 +1,135 @@
+# coding: utf-8
+
+"""
+SPARQL generation, quepy's plus the language filters of `dsl.py` and the
+entities resolved by a label index (see `labels.py`).
+"""
+
+import re
+
+from quepy import settings, generation
+from quepy.dsl import IsRelatedTo, HasKeyword, FixedType
+from quepy.expression import isnode
+from quepy.sparql_generation import adapt, triple
+
+from dsl import InLanguage
+
+# Labels matching more resources than this are still matched by the
+# endpoint.
+MAX_RESOLVED = 10
+
+_keyword = re.compile(r'^"(.*)"@\w+$')
+
+
+def language_filter(node, language):
+    return u"  FILTER(lang({0}) = \"{1}\")".format(adapt(node), language)
+
+
+def is_keyword(relation, dest):
+    return relation == HasKeyword.relation and not isnode(dest)
+
+
+def resolve_keywords(e, labels):
+    """
+    Returns the URIs of the resources of the nodes of `e` looked up by
+    `HasKeyword` that the `labels` index knows about, by node. The types
+    of the node are used to tell homonyms apart.
+    """
+
+    resolved = {}
+    for node in e.iter_nodes():
+        label = None
+        types = []
+        for relation, dest in e.iter_edges(node):
+            if is_keyword(relation, dest):
+                match = _keyword.match(dest)
+                label = match.group(1) if match else dest
+            elif relation == FixedType.fixedtyperelation and \
+                    not isnode(dest):
+                types.append(dest)
+        if label is None:
+            continue
+
+        for fixedtype in types + [None]:
+            uris = labels.resolve(label, fixedtype)
+            if uris:
+                break
+        if 0 < len(uris) <= MAX_RESOLVED:
+            resolved[node] = uris
+    return resolved
+
+
+def expression_to_sparql(e, full=False, labels=None, parameters=None):
+    """
+    `parameters` maps literals of `e` to a `(variable, terms)` pair: the
+    variable takes their place and the terms are given in a VALUES
+    block. The variables are selected before the head.
+    """
+
+    template = u"{preamble}\n" +\
+               u"SELECT DISTINCT {select} WHERE {{\n" +\
+               u"{expression}\n" +\
+               u"}}\n"
+    head = adapt(e.get_head())
+    parameters = parameters or {}
+    if full:
+        select = u"*"
+    else:
+        select = u" ".join(sorted(set(variable for variable, _ in
+                                      parameters.values())) + [head])
+
+    # Resolved nodes take their URI in place of the label lookup, or a
+    # VALUES block if they are many or selected.
+    resolved = {}
+    if labels is not None:
+        resolved = resolve_keywords(e, labels)
+    terms = {}
+    values = []
+    for node, uris in sorted(resolved.items()):
+        uris = [u"<{0}>".format(uri) for uri in uris]
+        if len(uris) == 1 and node != e.get_head():
+            terms[node] = uris[0]
+        else:
+            values.append(u"  VALUES {0} {{ {1} }}".format(
+                adapt(node), u" ".join(uris)))
+    for literal, (variable, literals) in sorted(parameters.items()):
+        values.append(u"  VALUES {0} {{ {1} }}".format(
+            variable, u" ".join(literals)))
+
+    def term(x):
+        if isnode(x) and x in terms:
+            return terms[x]
+        if not isnode(x) and x in parameters:
+            return parameters[x][0]
+        return adapt(x)
+
+    y = 0
+    xs = []
+    filters = []
+    for node in e.iter_nodes():
+        for relation, dest in e.iter_edges(node):
+            if relation is InLanguage:
+                filters.append(language_filter(node, dest))
+                continue
+            if node in resolved and is_keyword(relation, dest):
+                continue
+            if relation is IsRelatedTo:
+                relation = u"?y{}".format(y)
+                y += 1
+            xs.append(triple(term(node), relation, term(dest),
+                      indentation=1))
+    sparql = template.format(preamble=settings.SPARQL_PREAMBLE,
+                             select=select,
+                             expression=u"\n".join(values + xs + filters))
+    return select, sparql
+
+
+def get_code(expression, language, labels=None):
+    """
+    Like `quepy.generation.get_code`, using `expression_to_sparql` above
+    for SPARQL.
+    """
+
+    if language == "sparql":
+        return expression_to_sparql(expression, labels=labels)
+    return generation.get_code(expression, language)
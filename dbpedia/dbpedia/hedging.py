@@ -0,0 +1,173 @@
+# coding: utf-8
+
+"""
+Hedged requests: a query the primary endpoint is slow to answer is sent
+to a mirror too, and the first results win.
+"""
+
+import sys
+import time
+import threading
+from collections import deque
+
+from settings import SPARQL_HEDGE_PERCENTILE, SPARQL_HEDGE_DELAY, \
+    SPARQL_POOL_SIZE
+from combine import query_combined
+from executor import WorkerPool
+
+# Latencies of the primary the hedge delay is computed from, it's
+# SPARQL_HEDGE_DELAY until there are MIN_SAMPLES of them.
+SAMPLES = 1000
+MIN_SAMPLES = 20
+
+
+class Latencies(object):
+    """
+    The last `size` latencies measured.
+    """
+
+    def __init__(self, size=SAMPLES):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent):
+        """
+        Returns the latency `percent` of the samples are below of, None
+        if there are less than MIN_SAMPLES.
+        """
+
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        index = int(round(percent / 100.0 * (len(samples) - 1)))
+        return samples[index]
+
+
+class _Race(object):
+    """
+    The requests sent for one query. `done` is set once one of them
+    answered or all of them failed.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.results = None
+        self.winner = None
+        self.errors = []
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def send(self, client, query, deadline, latencies=None, pool=None):
+        """
+        Sends `query` to `client` from `pool`, or from a thread of its own
+        if there's no pool.
+        """
+
+        with self._lock:
+            self.sent += 1
+            # Those sent before may have failed already.
+            if self.winner is None:
+                self.done.clear()
+        args = (client, query, deadline, latencies)
+        if pool is not None:
+            pool.submit(self._run, *args)
+            return
+        thread = threading.Thread(target=self._run, args=args)
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, client, query, deadline, latencies):
+        start = time.time()
+        try:
+            results = client.query(query, deadline)
+        except Exception:
+            with self._lock:
+                self.errors.append(sys.exc_info())
+                if len(self.errors) == self.sent:
+                    self.done.set()
+            return
+
+        if latencies is not None:
+            latencies.add(time.time() - start)
+        with self._lock:
+            if self.winner is None:
+                self.results = results
+                self.winner = client
+                self.done.set()
+
+
+class HedgedClient(object):
+    """
+    Sends queries to the `primary` client and, if it hasn't answered once
+    `percentile` of its recent latencies have passed, to the `mirror`
+    client as well. The first results are returned, the other request is
+    left to finish. Streamed queries only go to the primary.
+
+    Queries are sent to the primary by `workers` threads, at most as many
+    as its connections. Only a hedge starts a thread of its own, so it
+    never waits behind queries the primary is slow to answer.
+    """
+
+    def __init__(self, primary, mirror, percentile=SPARQL_HEDGE_PERCENTILE,
+                 delay=SPARQL_HEDGE_DELAY, workers=SPARQL_POOL_SIZE):
+        self.primary = primary
+        self.mirror = mirror
+        self.percentile = percentile
+        self.delay = delay
+        self.endpoint = primary.endpoint
+        self.latencies = Latencies()
+        self.pool = WorkerPool(workers)
+        self.hedged = 0
+        self.mirror_wins = 0
+
+    def hedge_delay(self):
+        delay = self.latencies.percentile(self.percentile)
+        if delay is None:
+            return self.delay
+        return delay
+
+    def query(self, query, deadline=None):
+        race = _Race()
+        race.send(self.primary, query, deadline, self.latencies, self.pool)
+
+        delay = self.hedge_delay()
+        if deadline is not None:
+            delay = min(delay, max(deadline - time.time(), 0))
+        if not race.done.wait(delay) and \
+                (deadline is None or time.time() < deadline):
+            self.hedged += 1
+            race.send(self.mirror, query, deadline)
+
+        race.done.wait()
+        if race.winner is None:
+            error = race.errors[0]
+            raise error[0], error[1], error[2]
+        if race.winner is self.mirror:
+            self.mirror_wins += 1
+        return race.results
+
+    def query_many(self, queries, deadline=None):
+        return query_combined(self, queries, deadline)
+
+    def query_stream(self, query, deadline=None):
+        return self.primary.query_stream(query, deadline)
+
+    def stats(self):
+        stats = {
+            "hedged": self.hedged,
+            "mirror_wins": self.mirror_wins,
+            "hedge_delay": self.hedge_delay(),
+        }
+        if hasattr(self.primary, "stats"):
+            stats["primary"] = self.primary.stats()
+        return stats
+
+    def close(self):
+        self.pool.close()
+        self.primary.close()
+        self.mirror.close()
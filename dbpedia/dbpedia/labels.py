@@ -0,0 +1,177 @@
+# coding: utf-8
+
+"""
+Offline index from English labels to DBpedia resource URIs.
+
+The index is a sorted UTF-8 text file with one ``label<TAB>type<TAB>uri``
+line per resource label, plus one per `rdf:type` of the resource written
+as in dsl.py (``dbo:Film``), the type is empty on the first. Labels are
+normalized with `normalize_label`. It's written by build_label_index.py
+from the DBpedia labels and instance types dumps, and searched in place
+through mmap so it costs no memory to load.
+"""
+
+import re
+import bz2
+import mmap
+import logging
+
+logger = logging.getLogger("dbpedia.labels")
+
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+
+# Prefixes of the types used in dsl.py.
+TYPE_PREFIXES = [
+    ("dbo:", "http://dbpedia.org/ontology/"),
+    ("foaf:", "http://xmlns.com/foaf/0.1/"),
+]
+
+_triple = re.compile(r'^<([^>]*)> <([^>]*)> (?:<([^>]*)>|"(.*)"@en) \.$')
+
+_escape = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)")
+
+_escapes = {"t": u"\t", "n": u"\n", "r": u"\r", "b": u"\b", "f": u"\f"}
+
+# Characters that can't be in a SPARQL IRI.
+_invalid_iri = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+
+
+def normalize_label(label):
+    return u" ".join(label.lower().split())
+
+
+def _unescape(match):
+    escape = match.group(1)
+    if len(escape) > 1:
+        return unichr(int(escape[1:], 16))
+    return _escapes.get(escape, escape)
+
+
+def _open(path):
+    if path.endswith(".bz2"):
+        return bz2.BZ2File(path)
+    return open(path)
+
+
+def iter_triples(path, predicate):
+    """
+    Yields the ``(subject, object)`` pairs of the N-Triples file at
+    `path` (optionally bz2 compressed) with the given `predicate`, whose
+    object is a resource or an English literal.
+    """
+
+    with _open(path) as triples:
+        for line in triples:
+            match = _triple.match(line.decode("utf-8").strip())
+            if match is None or match.group(2) != predicate:
+                continue
+            subject, resource, literal = match.group(1, 3, 4)
+            if literal is not None:
+                yield subject, _escape.sub(_unescape, literal)
+            else:
+                yield subject, resource
+
+
+def short_type(uri):
+    for prefix, namespace in TYPE_PREFIXES:
+        if uri.startswith(namespace):
+            return prefix + uri[len(namespace):]
+    return None
+
+
+def build_label_index(labels_path, output, types_path=None):
+    """
+    Writes the index of the labels dump at `labels_path` to `output`,
+    split by the types in the `types_path` dump if given. Returns the
+    number of lines written. Everything is sorted in memory.
+    """
+
+    types = {}
+    if types_path is not None:
+        for resource, uri in iter_triples(types_path, RDF_TYPE):
+            fixedtype = short_type(uri)
+            if fixedtype is not None:
+                types.setdefault(resource, []).append(fixedtype)
+
+    lines = []
+    for resource, label in iter_triples(labels_path, RDFS_LABEL):
+        label = normalize_label(label)
+        if not label or _invalid_iri.search(resource):
+            continue
+        for fixedtype in [u""] + types.get(resource, []):
+            line = u"{0}\t{1}\t{2}\n".format(label, fixedtype, resource)
+            lines.append(line.encode("utf-8"))
+
+    lines.sort()
+    with open(output, "wb") as index:
+        index.writelines(lines)
+    return len(lines)
+
+
+class LabelIndex(object):
+    """
+    Read only view of the index at `path`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as index:
+            self._map = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _first_line(self, key):
+        """
+        Offset of the first line not sorting before `key`.
+        """
+
+        low, high = 0, len(self._map)
+        while low < high:
+            middle = (low + high) // 2
+            start = self._map.rfind("\n", 0, middle) + 1
+            end = self._map.find("\n", start)
+            if end == -1:
+                end = len(self._map)
+            if self._map[start:end] < key:
+                low = end + 1
+            else:
+                high = start
+        return low
+
+    def resolve(self, label, fixedtype=None):
+        """
+        Returns the URIs of the resources labeled `label`, of type
+        `fixedtype` if given.
+        """
+
+        key = u"{0}\t{1}\t".format(normalize_label(label), fixedtype or u"")
+        key = key.encode("utf-8")
+
+        uris = []
+        position = self._first_line(key)
+        while position < len(self._map):
+            end = self._map.find("\n", position)
+            if end == -1:
+                end = len(self._map)
+            line = self._map[position:end]
+            if not line.startswith(key):
+                break
+            uris.append(line[len(key):].decode("utf-8"))
+            position = end + 1
+        return uris
+
+    def close(self):
+        self._map.close()
+
+
+def open_label_index(path):
+    """
+    Returns the `LabelIndex` at `path`, or None if there's none.
+    """
+
+    if path is None:
+        return None
+    try:
+        return LabelIndex(path)
+    except (IOError, ValueError) as error:
+        logger.warning(u"No label index at {0}: {1}".format(path, error))
+        return None
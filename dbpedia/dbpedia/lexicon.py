@@ -0,0 +1,113 @@
+# coding: utf-8
+
+"""
+Prebuilt snapshot of the WordNet synonym expansions used by the templates.
+
+The snapshot is a small JSON file mapping ``word/speech_part`` keys to the
+list of synonyms `Synonyms.findSynonyms` would compute from WordNet. It is
+written by ``build_lexicon.py`` and lets the application start without
+loading the WordNet corpus.
+"""
+
+import json
+import codecs
+import logging
+
+logger = logging.getLogger("dbpedia.lexicon")
+
+# Bump when the file layout or the expansion algorithm changes, older
+# snapshots are then ignored and WordNet is used instead.
+LEXICON_VERSION = 1
+
+_snapshots = {}
+
+
+def lexicon_key(word, speech_part):
+    return u"{0}/{1}".format(word, speech_part)
+
+
+def wordnet_expand(word, speech_part):
+    """
+    Returns the lemmas of every synset of `word` plus the lemmas of their
+    hypernyms, in WordNet order.
+    """
+
+    from nltk.corpus import wordnet
+
+    synonyms = []
+
+    for syn in wordnet.synsets(word, pos=speech_part):
+        for l in syn.lemmas():
+            synonyms.append(l.name().replace("_", " "))
+        for hyper in syn.hypernyms():
+            for l in hyper.lemmas():
+                synonyms.append(l.name().replace("_", " "))
+
+    return synonyms
+
+
+def load_lexicon(path):
+    """
+    Returns the expansions stored at `path`, or an empty dict if the
+    snapshot is missing or was built with another `LEXICON_VERSION`.
+    The file is read once per process.
+    """
+
+    if path in _snapshots:
+        return _snapshots[path]
+
+    entries = {}
+    try:
+        with codecs.open(path, encoding="utf-8") as snapshot:
+            data = json.load(snapshot)
+    except IOError:
+        logger.debug(u"No synonym lexicon at {0}".format(path))
+    except ValueError:
+        logger.warning(u"Corrupt synonym lexicon at {0}".format(path))
+    else:
+        if data.get("version") != LEXICON_VERSION:
+            message = u"Ignoring synonym lexicon {0}: version {1!r}, " \
+                      u"expected {2!r}"
+            logger.warning(message.format(path, data.get("version"),
+                                          LEXICON_VERSION))
+        else:
+            entries = data["synonyms"]
+
+    _snapshots[path] = entries
+    return entries
+
+
+def lookup(path, word, speech_part):
+    """
+    Returns the stored expansion of `word` or None if it isn't in the
+    snapshot.
+    """
+
+    return load_lexicon(path).get(lexicon_key(word, speech_part))
+
+
+def build_lexicon(pairs, path):
+    """
+    Expands every ``(word, speech_part)`` in `pairs` with WordNet and writes
+    the snapshot to `path`. Returns the number of entries written.
+    """
+
+    from nltk.corpus import wordnet
+
+    synonyms = {}
+    for word, speech_part in pairs:
+        synonyms[lexicon_key(word, speech_part)] = \
+            wordnet_expand(word, speech_part)
+
+    data = {
+        "version": LEXICON_VERSION,
+        "wordnet": wordnet.get_version(),
+        "synonyms": synonyms,
+    }
+
+    with codecs.open(path, "w", encoding="utf-8") as snapshot:
+        json.dump(data, snapshot, sort_keys=True,
+                  separators=(",", ":"), ensure_ascii=False)
+
+    _snapshots[path] = synonyms
+    return len(synonyms)
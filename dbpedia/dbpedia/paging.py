@@ -0,0 +1,111 @@
+# coding: utf-8
+
+"""
+Enumeration queries fetched in pages, with LIMIT/OFFSET cursors.
+"""
+
+import re
+from itertools import islice
+
+from settings import SPARQL_PAGE_SIZE
+from stream import Bindings
+
+_select = re.compile(r"SELECT DISTINCT (\?\w+) WHERE \{")
+
+
+def page_query(query, target, limit, offset):
+    """
+    Returns `query` restricted to `limit` results from `offset`, ordered by
+    `target` so pages don't overlap.
+    """
+
+    return u"{0}ORDER BY ?{1}\nLIMIT {2}\nOFFSET {3}\n".format(
+        query, target, limit, offset)
+
+
+def count_query(query):
+    """
+    Returns a query counting the distinct results of `query`.
+    """
+
+    query, found = _select.subn(
+        u"SELECT (COUNT(DISTINCT \\1) AS ?count) WHERE {", query, count=1)
+    if not found:
+        raise ValueError("Can't count the results of {0!r}".format(query))
+    return query
+
+
+def count_results(client, query, deadline=None):
+    """
+    Returns the number of results of `query`, without fetching them.
+    """
+
+    results = client.query(count_query(query), "count", deadline)
+    return int(results["results"]["bindings"][0]["count"]["value"])
+
+
+class Page(object):
+    """
+    Up to `size` of the `bindings` from `offset`, decoded as they're
+    iterated, once. `cursor` is the offset of the next page, None if
+    this is the last one, known once the page is read.
+    """
+
+    def __init__(self, bindings, offset, size):
+        self.bindings = bindings
+        self.offset = offset
+        self.size = size
+        self.cursor = None
+
+    def __iter__(self):
+        bindings = iter(self.bindings)
+        for binding in islice(bindings, self.size):
+            yield binding
+        # One more than asked for tells whether there's a next page.
+        if next(bindings, None) is not None:
+            self.cursor = self.offset + self.size
+            for _ in bindings:
+                pass
+
+
+def fetch_page(client, query, target, offset=0, size=SPARQL_PAGE_SIZE,
+               query_type=None, deadline=None):
+    results = client.query_stream(page_query(query, target, size + 1,
+                                             offset),
+                                  query_type, deadline)
+    return Page(results["results"]["bindings"], offset, size)
+
+
+def iter_pages(client, query, target, offset=0, size=SPARQL_PAGE_SIZE,
+               query_type=None, pages=None, deadline=None):
+    """
+    Yields the pages of `query` from `offset`, fetching each one when the
+    previous is consumed. Stops after `pages` pages if given. Pages are
+    fetched up to `deadline`.
+    """
+
+    fetched = 0
+    while offset is not None and (pages is None or fetched < pages):
+        page = fetch_page(client, query, target, offset, size, query_type,
+                          deadline)
+        fetched += 1
+        yield page
+        offset = page.cursor
+
+
+class PagedBindings(Bindings):
+    """
+    `Bindings` of a sequence of pages. `cursor` is the offset of the page
+    after the last one fetched, None if there are no more, or the given
+    `cursor` if none was fetched.
+    """
+
+    def __init__(self, pages, cursor=None):
+        self.cursor = cursor
+        super(PagedBindings, self).__init__(self._iter_bindings(pages))
+
+    def _iter_bindings(self, pages):
+        for page in pages:
+            for binding in page:
+                yield binding
+            self.cursor = page.cursor
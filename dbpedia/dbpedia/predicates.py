@@ -0,0 +1,97 @@
+# coding: utf-8
+
+"""
+Set based lemma predicates for synonym alternations.
+"""
+
+from refo import Predicate, Question
+from refo.patterns import Pattern
+from quepy.parsing import Lemma
+from quepy.encodingpolicy import encoding_flexible_conversion
+
+# quepy ends the words it matches with None.
+_EOL = None
+
+
+class LemmaSet(Predicate):
+    """
+    Predicate to check if a word's *lemma* is one of `lemmas`.
+    Equivalent to `Lemma(a) | Lemma(b) | ...` but checked with a single
+    set lookup.
+    """
+
+    def __init__(self, lemmas):
+        self.lemmas = frozenset(encoding_flexible_conversion(lemma)
+                                for lemma in lemmas)
+        super(LemmaSet, self).__init__(self._predicate)
+        self.arg = u"|".join(sorted(self.lemmas))
+
+    def _predicate(self, word):
+        return word is not _EOL and word.lemma in self.lemmas
+
+
+class LemmaTrie(Pattern):
+    """
+    Matches any of the multi word `phrases` (lemmas separated by spaces).
+    Phrases sharing a prefix share the branch that matches it, so a word
+    is only compared once per trie level instead of once per phrase.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = sorted(set(encoding_flexible_conversion(phrase)
+                                  for phrase in phrases))
+        assert self.phrases
+        trie = {}
+        for phrase in self.phrases:
+            node = trie
+            for lemma in phrase.split():
+                node = node.setdefault(lemma, {})
+            node[None] = {}
+        self.x = self._trie_pattern(trie)
+        self.arg = self.phrases
+
+    def _trie_pattern(self, node):
+        leaves = []
+        branches = []
+        for lemma, child in sorted(node.items()):
+            if lemma is None:
+                continue
+            if child.keys() == [None]:
+                leaves.append(lemma)
+                continue
+            rest = self._trie_pattern(child)
+            if None in child:
+                rest = Question(rest)
+            branches.append(Lemma(lemma) + rest)
+
+        if len(leaves) == 1:
+            branches.insert(0, Lemma(leaves[0]))
+        elif leaves:
+            branches.insert(0, LemmaSet(leaves))
+
+        pattern = branches[0]
+        for branch in branches[1:]:
+            pattern |= branch
+        return pattern
+
+    def _compile(self, cont):
+        return self.x._compile(cont)
+
+    def __str__(self):
+        return "LemmaTrie({0})".format(", ".join(self.phrases))
+
+
+def lemma_alternation(synonyms):
+    """
+    Returns a pattern matching any of `synonyms`: one `LemmaSet` for the
+    single words and one `LemmaTrie` for the multi word ones.
+    """
+
+    words = [x for x in synonyms if " " not in x]
+    phrases = [x for x in synonyms if " " in x]
+
+    if words and phrases:
+        return LemmaSet(words) | LemmaTrie(phrases)
+    elif phrases:
+        return LemmaTrie(phrases)
+    return LemmaSet(words)
@@ -11,15 +11,95 @@
 Settings.
 """
 
+import os
+
 # Generated query language
 LANGUAGE = "sparql"
 
 # NLTK config
 NLTK_DATA_PATH = ["/home/stef/Documents"]  # List of paths with NLTK data
 
+# Tagger config
+# "nltk" keeps NLTK's model and lemmas loaded between questions, "quepy" is
+# quepy's tagger (same output), or the dotted path of a Tagger subclass
+# from dbpedia/tagging.py.
+TAGGER = "nltk"
+LEMMA_CACHE_SIZE = 100000  # Lemmas the "nltk" tagger keeps
+
+# Synonyms config
+# Prebuilt WordNet expansions written by build_lexicon.py, words missing
+# from it are still looked up in WordNet. None always uses WordNet.
+SYNONYMS_LEXICON = os.path.join(os.path.dirname(__file__), "lexicon.json")
+
+# Templates config
+# Domain modules whose templates are loaded, see ALL_DOMAINS in __init__.py
+DOMAINS = ["basic", "music", "movies", "people", "country",
+           "populated_place", "tvshows", "writers", "football", "language"]
+
+# Only try the templates whose required words are in the question.
+TEMPLATE_INDEX = True
+
+# Questions whose (target, query, metadata) are remembered, 0 disables it.
+# Questions are compared ignoring whitespace and final punctuation.
+COMPILE_CACHE_SIZE = 10000
+
+# Entity resolution config
+# Label to URI index written by build_label_index.py, the entities found in
+# it are queried by URI instead of by label. None disables it.
+LABEL_INDEX = None
+
 # Encoding config
 DEFAULT_ENCODING = "utf-8"
 
+# Sparql endpoint config
+SPARQL_ENDPOINT = "http://dbpedia.org/sparql"
+SPARQL_POOL_SIZE = 8  # Kept alive connections, also the concurrency limit
+SPARQL_TIMEOUT = 30  # Seconds, per socket operation
+SPARQL_PAGE_SIZE = 1000  # Enum results per query, None fetches them at once
+SPARQL_COMBINE_SIZE = 8  # Batched queries sent per request, 1 disables
+SPARQL_SWEEP_SIZE = 100  # Names per query of a template sweep
+SPARQL_MIRROR = None  # Also sent the queries the endpoint is slow on
+SPARQL_HEDGE_PERCENTILE = 95  # Of the endpoint latencies, slow above it
+SPARQL_HEDGE_DELAY = 1.0  # Seconds, slow above it until latencies are known
+
+# Mirrors of the endpoint the queries are balanced over, see balancer.py
+SPARQL_ENDPOINTS = [SPARQL_ENDPOINT]
+SPARQL_EJECT_FAILURES = 3  # Failed requests in a row ejecting an endpoint
+SPARQL_HEALTH_INTERVAL = 5  # Seconds between health checks, 0 disables them
+SPARQL_HEALTH_TIMEOUT = 2  # Seconds a health check may take
+SPARQL_HEALTH_QUERY = u"SELECT * WHERE { ?s ?p ?o } LIMIT 1"
+
+# Question deadlines, seconds from the time a question arrives to the last
+# of its SPARQL requests, by query type (None is the default, 0 no deadline)
+QUESTION_TIMEOUTS = {
+    None: 30,
+    "define": 10,
+    "literal": 10,
+    "time": 10,
+    "age": 10,
+    "enum": 60,
+}
+
+# Sparql results cache config
+SPARQL_CACHE_SIZE = 1000  # Results kept in memory
+SPARQL_CACHE_PATH = None  # Shelve file for a persistent tier, None disables
+SPARQL_CACHE_MAX_BINDINGS = 10000  # Larger streamed results aren't cached
+SPARQL_CACHE_TTL = {  # Seconds per query type, None is the default
+    "define": 7 * 24 * 3600,
+    "enum": 24 * 3600,
+    "literal": 24 * 3600,
+    "time": 7 * 24 * 3600,
+    "age": 24 * 3600,
+    "count": 24 * 3600,
+    None: 3600,
+}
+
+# Slow question log config
+SLOW_LOG_PATH = None  # Rotating log of slow questions, None disables timing
+SLOW_LOG_THRESHOLD = 2.0  # Seconds, from tagging to rendering
+SLOW_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+
 # Sparql config
 SPARQL_PREAMBLE = u"""
 PREFIX owl: <http://www.w3.org/2002/07/owl#>
@@ -0,0 +1,82 @@
+# coding: utf-8
+
+"""
+Incremental decoding of SPARQL JSON results.
+"""
+
+import re
+import json
+import codecs
+
+_bindings_start = re.compile(r'"bindings"\s*:\s*\[')
+
+_separators = re.compile(r"[\s,]*")
+
+_json = json.JSONDecoder()
+
+
+def iter_bindings(chunks):
+    """
+    Yields the bindings of the SPARQL JSON results read from the `chunks`
+    of bytes, each one as soon as it's complete, so the whole document is
+    never in memory.
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+
+    # The head comes first and is small, keep reading until the bindings.
+    buffer = u""
+    while True:
+        match = _bindings_start.search(buffer)
+        if match is not None:
+            break
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError("No bindings in the SPARQL results")
+        buffer += decoder.decode(chunk)
+
+    position = match.end()
+    while True:
+        position = _separators.match(buffer, position).end()
+        if buffer[position:position + 1] == u"]":
+            # Read the rest so the connection can be reused.
+            for chunk in chunks:
+                pass
+            return
+
+        try:
+            binding, position = _json.raw_decode(buffer, position)
+        except ValueError:
+            # Incomplete binding, or garbage if the stream is over.
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError("Invalid or truncated SPARQL results")
+            buffer = buffer[position:] + decoder.decode(chunk)
+            position = 0
+            continue
+
+        yield binding
+
+
+class Bindings(object):
+    """
+    Bindings decoded on demand, they can be iterated once. It's true if
+    there's at least one, which is read upfront to know it.
+    """
+
+    _end = object()
+
+    def __init__(self, bindings):
+        self._bindings = iter(bindings)
+        self._first = next(self._bindings, self._end)
+
+    def __nonzero__(self):
+        return self._first is not self._end
+
+    def __iter__(self):
+        if self._first is self._end:
+            return
+        yield self._first
+        for binding in self._bindings:
+            yield binding
@@ -0,0 +1,228 @@
+# coding: utf-8
+
+"""
+Template sweeps: a question template answered for every name of a column
+with a few queries, the names given in VALUES blocks, instead of tagging,
+matching and querying one question per name.
+
+The template builds its expression once with `PLACEHOLDER` as the name,
+the literal holding it becomes the `VARIABLE` of the VALUES blocks. Each
+name is still run through the template (not the tagger) to get the
+literal it stands for, so particles that change the name, such as
+``.title()``, keep doing it.
+"""
+
+from refo import Concatenation, Disjunction
+from refo.patterns import Pattern
+from quepy.expression import isnode
+from quepy.parsing import QuestionTemplate, Particle, WordList, BadSemantic
+from quepy.sparql_generation import adapt
+from quepy.tagger import Word
+
+from generation import expression_to_sparql
+
+# Unchanged by lower() and title(), never found in a name.
+PLACEHOLDER = u"\ufffc"
+
+VARIABLE = u"?entity"
+
+
+class SweepError(Exception):
+    """
+    The template can't be swept, see `compile_sweep`.
+    """
+
+
+def escape(name):
+    return name.replace(u"\\", u"\\\\").replace(u'"', u'\\"')
+
+
+def iter_particles(pattern):
+    """
+    Yields the particles of the refo `pattern`.
+    """
+
+    if isinstance(pattern, Particle):
+        yield pattern
+    elif isinstance(pattern, Concatenation):
+        for x in pattern.xs:
+            for particle in iter_particles(x):
+                yield particle
+    elif isinstance(pattern, Disjunction):
+        for particle in iter_particles(pattern.a):
+            yield particle
+        for particle in iter_particles(pattern.b):
+            yield particle
+    elif isinstance(getattr(pattern, "x", None), Pattern):
+        for particle in iter_particles(pattern.x):
+            yield particle
+
+
+class NameMatch(object):
+    """
+    Stands for the match of a template whose particle matched `name`.
+    """
+
+    def __init__(self, particles, name):
+        self._particles = particles
+        self.words = WordList([Word(token) for token in name.split()])
+
+    def __getattr__(self, attr):
+        if attr in self._particles:
+            return self._particles[attr].interpret(self)
+        raise AttributeError(attr)
+
+
+def interpreter(template):
+    """
+    Returns a function from a name to the `(expression, userdata)` pair
+    `template` gives for it. `template` is a `QuestionTemplate` class or
+    instance with a single particle, or a function from a name to an
+    expression (or to an `(expression, userdata)` pair).
+    """
+
+    if isinstance(template, type) and issubclass(template, QuestionTemplate):
+        template = template()
+
+    if isinstance(template, QuestionTemplate):
+        particles = dict((particle.name, particle)
+                         for particle in iter_particles(template.regex))
+        if len(particles) != 1:
+            raise SweepError(u"{0} has {1} particles, sweeps need one".format(
+                type(template).__name__, len(particles)))
+        build = lambda name: template.interpret(NameMatch(particles, name))
+    else:
+        build = template
+
+    def interpret(name):
+        result = build(name)
+        if isinstance(result, tuple):
+            return result
+        return result, None
+
+    return interpret
+
+
+def _parameter(e):
+    """
+    Returns the node and position of the edge of `e` to the literal with
+    `PLACEHOLDER`.
+    """
+
+    found = []
+    for node in e.iter_nodes():
+        for i, (relation, dest) in enumerate(e.iter_edges(node)):
+            if not isnode(dest) and PLACEHOLDER in dest:
+                found.append((node, i))
+    if len(found) != 1:
+        raise SweepError(u"The name is in {0} literals of the expression, "
+                         u"sweeps need one".format(len(found)))
+    return found[0]
+
+
+def _literal(e, node, position, relation):
+    """
+    Returns the literal at `position` among the edges of `node` in `e`
+    if it's related by `relation`, None otherwise.
+    """
+
+    edges = list(e.iter_edges(node))
+    if position < len(edges) and edges[position][0] == relation:
+        dest = edges[position][1]
+        if not isnode(dest):
+            return dest
+    return None
+
+
+class Sweep(object):
+    """
+    The queries answering a template for `names`, see `compile_sweep`.
+    `queries` holds `(query, literals)` pairs, `errors` the names the
+    template failed on by row.
+    """
+
+    def __init__(self, names, target, userdata):
+        self.names = names
+        self.target = target
+        self.userdata = userdata
+        self.queries = []
+        self.errors = {}
+        self._literals = [None] * len(names)
+
+    def split(self, results):
+        """
+        Returns the bindings of `results`, the results of one of the
+        `queries`, by literal.
+        """
+
+        variable = VARIABLE[1:]
+        bindings = {}
+        for binding in results["results"]["bindings"]:
+            value = binding[variable]
+            literal = u'"{0}"'.format(escape(value["value"]))
+            if value.get("xml:lang"):
+                literal += u"@" + value["xml:lang"]
+            binding = dict((name, x) for name, x in binding.iteritems()
+                           if name != variable)
+            bindings.setdefault(literal, []).append(binding)
+        return bindings
+
+    def table(self, bindings, errors=None):
+        """
+        Returns a `(results, error)` pair per name, in input order, given
+        the `bindings` of each literal and the `errors` of the literals
+        whose query failed. `results` are shaped like the endpoint's.
+        """
+
+        errors = errors or {}
+        rows = []
+        for row, literal in enumerate(self._literals):
+            if row in self.errors:
+                rows.append((None, self.errors[row]))
+            elif literal in errors:
+                rows.append((None, errors[literal]))
+            else:
+                results = {
+                    "head": {"vars": [self.target[1:]]},
+                    "results": {"bindings": bindings.get(literal, [])},
+                }
+                rows.append((results, None))
+        return rows
+
+
+def compile_sweep(template, names, block_size):
+    """
+    Returns the `Sweep` of `template` (see `interpreter`) over the list
+    of `names`, `block_size` distinct names per query. Raises
+    `SweepError` if the name doesn't end up in exactly one literal.
+    """
+
+    interpret = interpreter(template)
+    shape, userdata = interpret(PLACEHOLDER)
+    node, position = _parameter(shape)
+    relation, placeholder = list(shape.iter_edges(node))[position]
+
+    sweep = Sweep(names, adapt(shape.get_head()), userdata)
+    literals = []
+    seen = set()
+    for row, name in enumerate(names):
+        try:
+            e, _ = interpret(escape(name))
+        except BadSemantic as error:
+            sweep.errors[row] = u"BadSemantic: {0}".format(error)
+            continue
+        literal = _literal(e, node, position, relation)
+        if literal is None:
+            sweep.errors[row] = u"The expression doesn't fit the sweep"
+            continue
+        if literal not in seen:
+            seen.add(literal)
+            literals.append(literal)
+        sweep._literals[row] = literal
+
+    for i in xrange(0, len(literals), block_size):
+        block = literals[i:i + block_size]
+        parameters = {placeholder: (VARIABLE, block)}
+        _, query = expression_to_sparql(shape, parameters=parameters)
+        sweep.queries.append((query, block))
+    return sweep
@@ -1,19 +1,27 @@
-from nltk.corpus import wordnet
 from quepy.parsing import Lemma, Lemmas
 
-class Synonyms: 
+from lexicon import lookup, wordnet_expand
+from predicates import lemma_alternation
+from settings import SYNONYMS_LEXICON
+
+class Synonyms:
+    # Every (word, speech part) expanded in this process, the lexicon
+    # build step snapshots exactly these.
+    requested = set()
+
+    def __init__(self, lexicon_path=SYNONYMS_LEXICON):
+        self.lexicon_path = lexicon_path
+
     def findSynonyms(self, word, speech_part):
-        synonyms = []
-
-        for syn in wordnet.synsets(word, pos = speech_part):
-            for l in syn.lemmas():
-                synonyms.append(l.name().replace("_", " "))
-            for hyper in syn.hypernyms():
-                for l in hyper.lemmas():
-                    synonyms.append(l.name().replace("_", " "))
-    
-        return synonyms
-    
+        Synonyms.requested.add((word, speech_part))
+
+        if self.lexicon_path:
+            synonyms = lookup(self.lexicon_path, word, speech_part)
+            if synonyms is not None:
+                return list(synonyms)
+
+        return wordnet_expand(word, speech_part)
+
     def applyLemma(self, word):
         if(' ' in word):
             return Lemmas(word)
@@ -21,13 +29,4 @@ class Synonyms:
 
     def getLemmaPreposition(self, word, speech_part):
         synonyms = self.findSynonyms(word, speech_part)
-
-        topic = self.applyLemma(synonyms[0])
-
-        n = len(synonyms)
-        i = 1
-        while i < n:
-            topic |= self.applyLemma(synonyms[i])
-            i += 1
-        
-        return topic
+        return lemma_alternation(synonyms)
@@ -0,0 +1,144 @@
+# coding: utf-8
+
+"""
+POS tagger backends, all producing the `quepy.tagger.Word` lists the
+templates match against.
+"""
+
+import logging
+import threading
+from importlib import import_module
+
+from quepy import tagger as quepy_tagger
+from quepy.tagger import Word, PENN_TAGSET
+from quepy.encodingpolicy import assert_valid_encoding
+
+from cache import LRUCache
+from settings import LEMMA_CACHE_SIZE
+
+logger = logging.getLogger("dbpedia.tagging")
+
+
+class Tagger(object):
+    """
+    Turns questions into lists of `Word`, calling it tags one question.
+    """
+
+    def __init__(self, nltk_data_path=None):
+        self.nltk_data_path = nltk_data_path
+
+    def tag(self, question):
+        raise NotImplementedError
+
+    def __call__(self, question):
+        return self.tag(question)
+
+
+class QuepyTagger(Tagger):
+    """
+    quepy's own tagger. It reloads NLTK's model for every question.
+    """
+
+    def __init__(self, nltk_data_path=None):
+        super(QuepyTagger, self).__init__(nltk_data_path)
+        self._tagger = quepy_tagger.get_tagger()
+
+    def tag(self, question):
+        return self._tagger(question)
+
+
+class NltkTagger(Tagger):
+    """
+    Same output as `QuepyTagger`, keeping NLTK's model and the
+    LEMMA_CACHE_SIZE most recently used WordNet lemmas in memory.
+    """
+
+    def __init__(self, nltk_data_path=None):
+        super(NltkTagger, self).__init__(nltk_data_path)
+        self._pos_tag = None
+        self._tokenize = None
+        self._wordnet = None
+        self._morphy_tags = None
+        self._lemmas = LRUCache(LEMMA_CACHE_SIZE)
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        with self._load_lock:
+            if self._pos_tag is not None:
+                return
+
+            import nltk
+            if self.nltk_data_path:
+                nltk.data.path = self.nltk_data_path
+            from nltk.corpus import wordnet
+
+            # Recommended tokenizer doesn't handle non-ascii characters
+            self._tokenize = nltk.wordpunct_tokenize
+            self._wordnet = wordnet
+            self._morphy_tags = {
+                u"NN": wordnet.NOUN,
+                u"JJ": wordnet.ADJ,
+                u"VB": wordnet.VERB,
+                u"RB": wordnet.ADV,
+            }
+
+            try:
+                from nltk.tag import PerceptronTagger
+            except ImportError:
+                # Older NLTK versions cache their model themselves.
+                self._pos_tag = nltk.pos_tag
+            else:
+                model = PerceptronTagger()
+                self._pos_tag = model.tag
+
+    def _lemma(self, token, pos):
+        morphy_tag = self._morphy_tags.get(pos[:2])
+        key = (token, morphy_tag)
+        lemma = self._lemmas.get(key)
+        if lemma is None:
+            lemma = self._wordnet.morphy(token, pos=morphy_tag)
+            if isinstance(lemma, str):
+                lemma = lemma.decode("ascii")
+            if lemma is None:
+                lemma = token.lower()
+            self._lemmas.set(key, lemma)
+        return lemma
+
+    def _words(self, tags):
+        words = []
+        for token, pos in tags:
+            word = Word(token)
+            # Eliminates stuff like JJ|CC
+            word.pos = pos.split("|")[0].decode("ascii")
+            word.lemma = self._lemma(word.token, word.pos)
+            if word.pos not in PENN_TAGSET:
+                logger.warning("Tagger emmited a non-penn "
+                               "POS tag {!r}".format(word.pos))
+            words.append(word)
+        return words
+
+    def tag(self, question):
+        assert_valid_encoding(question)
+        if self._pos_tag is None:
+            self._load()
+        return self._words(self._pos_tag(self._tokenize(question)))
+
+
+TAGGERS = {
+    "quepy": QuepyTagger,
+    "nltk": NltkTagger,
+}
+
+
+def get_tagger(name, nltk_data_path=None):
+    """
+    Returns the tagger called `name` in `TAGGERS`, or the `Tagger` subclass
+    at the dotted path `name`.
+    """
+
+    if name in TAGGERS:
+        factory = TAGGERS[name]
+    else:
+        module, _, attribute = name.rpartition(".")
+        factory = getattr(import_module(module), attribute)
+    return factory(nltk_data_path)
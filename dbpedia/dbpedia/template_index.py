@@ -0,0 +1,119 @@
+# coding: utf-8
+
+"""
+Index of the words each question template needs in order to match.
+
+A template regex is reduced to *clauses*: sets of anchors such as
+``("lemma", u"capital")`` or ``("pos", u"WRB")``. Any question the regex
+matches contains, for every clause, a word satisfying at least one of its
+anchors. Templates with an unsatisfied clause are skipped without running
+the regex, which gives the same answer as trying them all.
+"""
+
+from refo import Predicate, Disjunction, Concatenation, Star, Plus, \
+    Question, Group, Repetition
+from quepy.parsing import Lemma, Pos, Token
+
+from predicates import LemmaSet, LemmaTrie
+
+# Disjunctions are expanded as a cross product of the clauses of each
+# branch, only the most selective ones of each branch are kept.
+MAX_CLAUSES = 4
+
+# Anchors are tried in this order when choosing the clause a template is
+# indexed under, POS tags appear in almost every question.
+_selectivity = {"lemma": 0, "token": 0, "pos": 1}
+
+
+def _clause_rank(clause):
+    return (max(_selectivity[kind] for kind, _ in clause), len(clause))
+
+
+def _best(clauses):
+    return sorted(clauses, key=_clause_rank)[:MAX_CLAUSES]
+
+
+def required_clauses(pattern):
+    """
+    Returns the list of clauses (frozensets of anchors) `pattern` can't
+    match without.
+    """
+
+    if isinstance(pattern, LemmaSet):
+        return [frozenset(("lemma", x) for x in pattern.lemmas)]
+    if isinstance(pattern, LemmaTrie):
+        return required_clauses(pattern.x)
+    if isinstance(pattern, Lemma):
+        return [frozenset([("lemma", pattern.tag)])]
+    if isinstance(pattern, Token):
+        return [frozenset([("token", pattern.tag)])]
+    if isinstance(pattern, Pos):
+        return [frozenset([("pos", pattern.tag)])]
+    if isinstance(pattern, Predicate):
+        return []
+    if isinstance(pattern, Concatenation):
+        clauses = []
+        for x in pattern.xs:
+            clauses.extend(required_clauses(x))
+        return clauses
+    if isinstance(pattern, Disjunction):
+        a = _best(required_clauses(pattern.a))
+        b = _best(required_clauses(pattern.b))
+        return [x | y for x in a for y in b]
+    if isinstance(pattern, (Plus, Group)):
+        return required_clauses(pattern.x)
+    if isinstance(pattern, Repetition) and pattern.mn > 0:
+        return required_clauses(pattern.x)
+    if isinstance(pattern, (Star, Question, Repetition)):
+        return []
+    return []
+
+
+def word_anchors(words):
+    """
+    Returns the set of anchors satisfied by the tagged `words`.
+    """
+
+    anchors = set()
+    for word in words:
+        anchors.add(("lemma", word.lemma))
+        anchors.add(("token", word.token))
+        anchors.add(("pos", word.pos))
+    return anchors
+
+
+class TemplateIndex(object):
+    """
+    Maps anchors to the templates that need them. `candidates` returns the
+    templates that may match a tagged question, in the original order.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.clauses = []
+        self.always = []
+        self.index = {}
+
+        for position, rule in enumerate(self.rules):
+            clauses = sorted(set(required_clauses(rule.regex)),
+                             key=_clause_rank)
+            self.clauses.append(clauses)
+            if not clauses:
+                self.always.append(position)
+                continue
+            for anchor in clauses[0]:
+                self.index.setdefault(anchor, []).append(position)
+
+    def candidates(self, words):
+        anchors = word_anchors(words)
+
+        positions = set(self.always)
+        for anchor in anchors:
+            positions.update(self.index.get(anchor, ()))
+
+        rules = []
+        for position in sorted(positions):
+            if all(not clause.isdisjoint(anchors)
+                   for clause in self.clauses[position][1:]):
+                rules.append(self.rules[position])
+        return rules
@@ -0,0 +1,156 @@
+# coding: utf-8
+
+"""
+Per stage timings of questions and the slow question log.
+"""
+
+import json
+import time
+import logging
+from collections import OrderedDict
+from logging.handlers import RotatingFileHandler
+
+from settings import SLOW_LOG_PATH, SLOW_LOG_THRESHOLD, \
+    SLOW_LOG_MAX_BYTES, SLOW_LOG_BACKUPS
+
+
+class _Stage(object):
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+        self._start = None
+
+    def start(self):
+        self._start = time.time()
+
+    def stop(self):
+        self.timings.add(self.name, time.time() - self._start)
+
+    def __enter__(self):
+        self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class Timings(object):
+    """
+    Seconds spent by one question in each stage (tagging, matching,
+    compilation, http, rendering) plus notes such as the template that
+    matched.
+    """
+
+    enabled = True
+
+    def __init__(self, question):
+        self.question = question
+        self.stages = OrderedDict()
+        self.notes = {}
+
+    def stage(self, name):
+        """
+        Context manager adding the time spent in it to stage `name`. Its
+        `start` and `stop` time a stage left and resumed several times.
+        """
+
+        return _Stage(self, name)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0) + seconds
+
+    def note(self, **notes):
+        self.notes.update(notes)
+
+    def total(self):
+        return sum(self.stages.values())
+
+    def as_dict(self):
+        entry = {
+            "question": self.question,
+            "total": self.total(),
+            "stages": self.stages,
+        }
+        entry.update(self.notes)
+        return entry
+
+
+class _NullStage(object):
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class NullTimings(object):
+    """
+    `Timings` that doesn't record anything, used when timing is off.
+    """
+
+    enabled = False
+
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def add(self, name, seconds):
+        pass
+
+    def note(self, **notes):
+        pass
+
+
+NULL_TIMINGS = NullTimings()
+
+
+class SlowLog(object):
+    """
+    Writes the timings of questions taking `threshold` seconds or more to
+    the rotating log at `path`, one JSON object per line. Timing is off
+    when `path` is None.
+    """
+
+    def __init__(self, path=SLOW_LOG_PATH, threshold=SLOW_LOG_THRESHOLD,
+                 max_bytes=SLOW_LOG_MAX_BYTES, backups=SLOW_LOG_BACKUPS):
+        self.path = path
+        self.threshold = threshold
+        self._logger = None
+
+        if path is not None:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes,
+                                          backupCount=backups)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.Logger("dbpedia.slow")
+            self._logger.addHandler(handler)
+
+    def timings(self, question):
+        """
+        Returns the `Timings` to fill for `question`.
+        """
+
+        if self._logger is None:
+            return NULL_TIMINGS
+        return Timings(question)
+
+    def report(self, timings):
+        """
+        Logs `timings` if the question was slow.
+        """
+
+        if not timings.enabled or timings.total() < self.threshold:
+            return
+        entry = timings.as_dict()
+        entry["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._logger.warning(json.dumps(entry))
+
+    def close(self):
+        if self._logger is not None:
+            for handler in self._logger.handlers:
+                handler.close()
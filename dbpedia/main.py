@@ -10,51 +10,172 @@
 
 """
 Main script for DBpedia quepy.
+
+    python main.py [-d] [endpoint] [--slow-log FILE] [paging] [question]
+    python main.py [-d] [endpoint] [--slow-log FILE] [paging]
+        [--workers N] [--combine N] --batch [file]
+    python main.py [endpoint] [--workers N] [--group-size N]
+        --wikipedia [file]
+    python main.py [endpoint] [--workers N] --sweep TEMPLATE [file]
+
+where endpoint is [--endpoint URL]... [--mirror URL] and paging is
+[--page-size N] [--offset N] [--pages N] [--count].
+
+Questions give up once the seconds of their query type in
+QUESTION_TIMEOUTS have passed. Queries are balanced over the endpoints
+given (SPARQL_ENDPOINTS by default), those failing are left out until a
+health check finds them answering again. With --mirror, queries the
+endpoints take longer than SPARQL_HEDGE_PERCENTILE of their latencies to
+answer are sent to the mirror too and the first answer is used.
+
+The batch mode writes JSON lines and reads stdin if no file is given.
+It sends up to --combine queries per request (1 sends them one by one).
+Enumerations are fetched N answers at a time from --offset, up to --pages
+pages, then the offset to continue from is shown. --count counts their
+answers first and only fetches them if there are any, --pages 0 only
+counts them.
+The --wikipedia mode reads one Wikipedia URL per line and writes JSON
+lines mapping each to its DBpedia resource, null if there's none, looking
+up --group-size URLs per query.
+The --sweep mode answers the TEMPLATE (a class name such as
+DirectorOfQuestion) for one name per line, SPARQL_SWEEP_SIZE names per
+query, and writes a JSON line per name.
+With --slow-log the questions slower than SLOW_LOG_THRESHOLD are logged
+to FILE with the time spent in each stage.
 """
 
+import re
 import sys
+import json
 import time
+import codecs
 import random
 import datetime
+from collections import OrderedDict
 
 import quepy
-from SPARQLWrapper import SPARQLWrapper, JSON
 
-sparql = SPARQLWrapper("http://dbpedia.org/sparql")
-dbpedia = quepy.install("dbpedia")
+from dbpedia.app import install
+from dbpedia.dsl import HasKeyword
+from dbpedia.cache import ResultCache, CachedClient
+from dbpedia.client import SparqlClient
+from dbpedia.hedging import HedgedClient
+from dbpedia.balancer import BalancedClient
+from dbpedia.executor import WorkerPool, Gate, ordered
+from dbpedia.combine import QueryBatch
+from dbpedia.sweep import SweepError, compile_sweep
+from dbpedia.timing import SlowLog, NULL_TIMINGS
+from dbpedia.paging import PagedBindings, iter_pages, count_results
+from dbpedia.settings import SPARQL_ENDPOINTS, SPARQL_MIRROR, \
+    SPARQL_POOL_SIZE, SPARQL_PAGE_SIZE, SPARQL_COMBINE_SIZE, \
+    SPARQL_SWEEP_SIZE, SPARQL_CACHE_PATH, QUESTION_TIMEOUTS
+
+
+def connect(endpoints=SPARQL_ENDPOINTS, mirror=SPARQL_MIRROR,
+            cache_path=SPARQL_CACHE_PATH):
+    """
+    Returns the cached client of `endpoints` (a URL or a list of them),
+    balancing the queries if there are several, and hedging the slow
+    ones with `mirror` if given. Results are also kept in the shelve at
+    `cache_path`, if not None.
+    """
+
+    if isinstance(endpoints, basestring):
+        endpoints = [endpoints]
+    if len(endpoints) == 1:
+        client = SparqlClient(endpoints[0])
+    else:
+        client = BalancedClient([SparqlClient(x) for x in endpoints])
+    if mirror:
+        client = HedgedClient(client, SparqlClient(mirror),
+                              workers=SPARQL_POOL_SIZE * len(endpoints))
+    return CachedClient(client, ResultCache(path=cache_path))
+
+
+sparql = connect()
+dbpedia = install()
+slow_log = SlowLog()
+
+# Threads sending queries to the endpoint.
+QUERY_WORKERS = 8
+
+# Distinct queries whose results are kept around for deduplication.
+DEDUP_SIZE = 10000
+
+# Questions left waiting on a batch of queries before it's sent half full.
+MAX_WAITING = 32
+
+# Queries that aren't streamed are sent up to COMBINE_SIZE per request.
+COMBINE_SIZE = SPARQL_COMBINE_SIZE
+
+# Names per query of sweep_template.
+SWEEP_SIZE = SPARQL_SWEEP_SIZE
+
+# Query types whose bindings are decoded and shown as they arrive.
+STREAMED_TYPES = ("enum",)
+
+# Streams sent before the question they answer is reached. Each holds a
+# connection until it's read, the rest of the pool is left to the other
+# queries, which may have to be answered first.
+STREAMS_AHEAD = SPARQL_POOL_SIZE // 2
+
+# Wikipedia URLs resolved per query by iter_wikipedia2dbpedia.
+WIKIPEDIA_GROUP_SIZE = 100
+
+# Characters that can't be in a SPARQL IRI.
+_invalid_iri = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+
+# Streamed results come in pages of PAGE_SIZE (None for a single query),
+# from FIRST_OFFSET and up to MAX_PAGES pages (None for all). With
+# COUNT_FIRST they're counted before, and not fetched if there are none.
+PAGE_SIZE = SPARQL_PAGE_SIZE
+FIRST_OFFSET = 0
+MAX_PAGES = None
+COUNT_FIRST = False
 
 # quepy.set_loglevel("DEBUG")
 
 
-def print_define(results, target, metadata=None):
+def format_define(results, target, metadata=None):
+    answers = []
+
     for result in results["results"]["bindings"]:
-        if result[target]["xml:lang"] == "en":
-            print result[target]["value"]
-            print
+        answers.append(result[target]["value"])
 
+    return answers
 
-def print_enum(results, target, metadata=None):
-    used_labels = []
 
+def iter_enum(results, target, metadata=None):
+    # DISTINCT is in the query, and so is the language filter of the
+    # relations that are a FixedLanguageRelation (see generation.py). The
+    # answers of the other relations are filtered here.
     for result in results["results"]["bindings"]:
-        if result[target]["type"] == u"literal":
-            if result[target]["xml:lang"] == "en":
-                label = result[target]["value"]
-                if label not in used_labels:
-                    used_labels.append(label)
-                    print label
+        value = result[target]
+        if value["type"] == u"literal" and \
+                value.get("xml:lang") == HasKeyword.language:
+            yield value["value"]
 
 
-def print_literal(results, target, metadata=None):
+def format_enum(results, target, metadata=None):
+    return list(iter_enum(results, target, metadata))
+
+
+def format_literal(results, target, metadata=None):
+    answers = []
+
     for result in results["results"]["bindings"]:
         literal = result[target]["value"]
         if metadata:
-            print metadata.format(literal)
+            answers.append(metadata.format(literal))
         else:
-            print literal
+            answers.append(literal)
 
+    return answers
+
+
+def format_time(results, target, metadata=None):
+    answers = []
 
-def print_time(results, target, metadata=None):
     gmt = time.mktime(time.gmtime())
     gmt = datetime.datetime.fromtimestamp(gmt)
 
@@ -83,11 +204,11 @@ def print_time(results, target, metadata=None):
             location_string = random.choice(["where you are",
                                              "your location"])
 
-            print "Between %s %s %s, depending on %s" % \
-                  (from_time.strftime("%H:%M"),
-                   connector,
-                   to_time.strftime("%H:%M on %A"),
-                   location_string)
+            answers.append("Between %s %s %s, depending on %s" %
+                           (from_time.strftime("%H:%M"),
+                            connector,
+                            to_time.strftime("%H:%M on %A"),
+                            location_string))
 
         else:
             offset = int(offset)
@@ -95,10 +216,12 @@ def print_time(results, target, metadata=None):
             delta = datetime.timedelta(hours=offset)
             the_time = gmt + delta
 
-            print the_time.strftime("%H:%M on %A")
+            answers.append(the_time.strftime("%H:%M on %A"))
 
+    return answers
 
-def print_age(results, target, metadata=None):
+
+def format_age(results, target, metadata=None):
     assert len(results["results"]["bindings"]) == 1
 
     birth_date = results["results"]["bindings"][0][target]["value"]
@@ -110,31 +233,474 @@ def print_age(results, target, metadata=None):
     now = now.date()
 
     age = now - birth_date
-    print "{} years old".format(age.days / 365)
+    return ["{} years old".format(age.days / 365)]
+
+
+def print_define(results, target, metadata=None):
+    for answer in format_define(results, target, metadata):
+        print answer
+        print
+
+
+def print_enum(results, target, metadata=None):
+    for label in iter_enum(results, target, metadata):
+        print label
+
+
+def print_literal(results, target, metadata=None):
+    for answer in format_literal(results, target, metadata):
+        print answer
+
+
+def print_time(results, target, metadata=None):
+    for answer in format_time(results, target, metadata):
+        print answer
+
+
+def print_age(results, target, metadata=None):
+    for answer in format_age(results, target, metadata):
+        print answer
+
+
+format_handlers = {
+    "define": format_define,
+    "enum": format_enum,
+    "time": format_time,
+    "literal": format_literal,
+    "age": format_age,
+}
+
+
+def wikipedia_query(wikipedia_urls):
+    values = u" ".join(u"<{0}>".format(url) for url in wikipedia_urls)
+    return u"""
+    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+    SELECT ?page ?url WHERE {
+        VALUES ?page { %s }
+        ?url foaf:isPrimaryTopicOf ?page.
+    }
+    """ % values
+
+
+def submit_wikipedia_group(wikipedia_urls, pool):
+    """
+    Submits the query resolving the valid URLs of `wikipedia_urls` to
+    `pool` and returns its task, None if none of them is valid.
+    """
+
+    valid = [url for url in wikipedia_urls if not _invalid_iri.search(url)]
+    if not valid:
+        return None
+    return pool.submit(sparql.query, wikipedia_query(valid))
+
+
+def iter_wikipedia_groups(wikipedia_urls, pool, group_size):
+    """
+    Yields a `(urls, task)` pair per group of up to `group_size` URLs,
+    submitting the query resolving each group to `pool`.
+    """
+
+    group = []
+    for url in wikipedia_urls:
+        group.append(url)
+        if len(group) == group_size:
+            yield group, submit_wikipedia_group(group, pool)
+            group = []
+    if group:
+        yield group, submit_wikipedia_group(group, pool)
+
+
+def iter_wikipedia2dbpedia(wikipedia_urls, group_size=WIKIPEDIA_GROUP_SIZE,
+                           workers=QUERY_WORKERS):
+    """
+    Yields a `(wikipedia_url, dbpedia_url, error)` triple per URL of the
+    `wikipedia_urls` iterable, in input order, resolving `group_size` of
+    them per query with up to `workers` queries in flight. `dbpedia_url`
+    is None when the page wasn't found, `error` is None unless the URL
+    can't be queried or its query failed.
+    """
+
+    pool = WorkerPool(workers)
+    groups = iter_wikipedia_groups(wikipedia_urls, pool, group_size)
+
+    try:
+        for group, task in ordered(groups, workers * 2):
+            found = {}
+            try:
+                if task is not None:
+                    results = task.result()
+                    for result in results["results"]["bindings"]:
+                        found.setdefault(result["page"]["value"],
+                                         result["url"]["value"])
+            except Exception as error:
+                for url in group:
+                    yield url, None, error_message(error)
+                continue
+
+            for url in group:
+                if _invalid_iri.search(url):
+                    yield url, None, u"Invalid URL"
+                else:
+                    yield url, found.get(url), None
+    finally:
+        pool.close()
 
 
 def wikipedia2dbpedia(wikipedia_url):
     """
     Given a wikipedia URL returns the dbpedia resource
-    of that page.
+    of that page, or None if it wasn't found.
     """
 
-    query = """
-    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
-    SELECT * WHERE {
-        ?url foaf:isPrimaryTopicOf <%s>.
+    for _, dbpedia_url, error in iter_wikipedia2dbpedia([wikipedia_url],
+                                                        workers=1):
+        if error is not None:
+            raise ValueError(error)
+        return dbpedia_url
+
+
+def resolve_wikipedia_batch(wikipedia_urls, output,
+                            group_size=WIKIPEDIA_GROUP_SIZE,
+                            workers=QUERY_WORKERS):
+    """
+    Writes one JSON object per URL of `wikipedia_urls` to `output`, in
+    input order and as soon as its group is resolved. Returns the number
+    of URLs not found.
+    """
+
+    misses = 0
+    for wikipedia_url, dbpedia_url, error in iter_wikipedia2dbpedia(
+            wikipedia_urls, group_size, workers):
+        record = {"wikipedia": wikipedia_url, "dbpedia": dbpedia_url}
+        if error is not None:
+            record["error"] = error
+        if dbpedia_url is None:
+            misses += 1
+        output.write(json.dumps(record) + "\n")
+    return misses
+
+
+def sweep_template(template, names, workers=QUERY_WORKERS,
+                   block_size=SWEEP_SIZE):
+    """
+    Answers `template` (see `sweep.interpreter`) for every one of the
+    `names`, `block_size` of them per query. Returns one object per name
+    in input order, with its "row", "name" and "answers", or an "error".
+    """
+
+    sweep = compile_sweep(template, names, block_size)
+    query_type, metadata = split_userdata(sweep.userdata)
+
+    pool = WorkerPool(workers)
+    try:
+        tasks = [(literals, pool.submit(sparql.query, query, query_type))
+                 for query, literals in sweep.queries]
+        bindings = {}
+        errors = {}
+        for literals, task in tasks:
+            try:
+                bindings.update(sweep.split(task.result()))
+            except Exception as error:
+                for literal in literals:
+                    errors[literal] = error_message(error)
+    finally:
+        pool.close()
+
+    handler = format_handlers[query_type]
+    table = []
+    for row, (results, error) in enumerate(sweep.table(bindings, errors)):
+        record = {"row": row, "name": names[row], "answers": []}
+        if results is not None:
+            try:
+                record["answers"] = handler(results, sweep.target[1:],
+                                            metadata)
+            except Exception as error:
+                record["error"] = error_message(error)
+        else:
+            record["error"] = error
+        table.append(record)
+    return table
+
+
+def compile_question(question, timings=NULL_TIMINGS):
+    """
+    Returns the target, query, query type and metadata for `question`.
+    The query is None if no template matched.
+    """
+
+    target, query, metadata = dbpedia.get_query(question, timings)
+    query_type, metadata = split_userdata(metadata)
+
+    if target is not None and target.startswith("?"):
+        target = target[1:]
+
+    return target, query, query_type, metadata
+
+
+def split_userdata(userdata):
+    """
+    Returns the query type and metadata in the `userdata` of a template.
+    """
+
+    if isinstance(userdata, tuple):
+        return userdata[0], userdata[1]
+    return userdata, None
+
+
+def question_deadline(start, query_type):
+    """
+    Returns the deadline of a question of `query_type` that arrived at
+    `start`, None if it has none (see QUESTION_TIMEOUTS).
+    """
+
+    timeout = QUESTION_TIMEOUTS.get(query_type, QUESTION_TIMEOUTS.get(None))
+    if not timeout:
+        return None
+    return start + timeout
+
+
+def run_query(query, query_type=None, timings=NULL_TIMINGS, target=None,
+              deadline=None):
+    with timings.stage("http"):
+        if query_type not in STREAMED_TYPES:
+            return sparql.query(query, query_type, deadline)
+        if PAGE_SIZE is None or target is None:
+            return sparql.query_stream(query, query_type, deadline)
+
+        head = {}
+        pages, cursor = MAX_PAGES, FIRST_OFFSET
+        if COUNT_FIRST:
+            head["count"] = count_results(sparql, query, deadline)
+            if head["count"] <= FIRST_OFFSET:
+                pages, cursor = 0, None
+        pages = iter_pages(sparql, query, target, FIRST_OFFSET, PAGE_SIZE,
+                           query_type, pages, deadline)
+        return {"head": head,
+                "results": {"bindings": PagedBindings(pages, cursor)}}
+
+
+def error_message(error):
+    return u"{0}: {1}".format(type(error).__name__, error)
+
+
+def locale_encoding():
+    """
+    The encoding of the locale, UTF-8 if that's ASCII (as in the C
+    locale).
+    """
+
+    encoding = sys.getfilesystemencoding() or "utf-8"
+    if codecs.lookup(encoding).name == "ascii":
+        return "utf-8"
+    return encoding
+
+
+def decode_input(value):
+    """
+    Decodes a command line argument or input line with `locale_encoding`.
+    """
+
+    return value.decode(locale_encoding())
+
+
+def iter_questions(stream):
+    """
+    Yields the non empty lines of `stream`, one question per line.
+    """
+
+    for line in stream:
+        question = line.strip()
+        if question:
+            yield question
+
+
+def new_record(question):
+    return {
+        "question": question,
+        "target": None,
+        "query": None,
+        "query_type": None,
+        "metadata": None,
+        "deadline": None,
+        "timings": slow_log.timings(question),
     }
-    """ % wikipedia_url
 
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    results = sparql.query().convert()
 
-    if not results["results"]["bindings"]:
-        print "Snorql URL not found"
-        sys.exit(1)
-    else:
-        return results["results"]["bindings"][0]["url"]["value"]
+def compile_record(question):
+    """
+    Returns the record of `question`, with its compiled query and its
+    deadline or an "error".
+    """
+
+    record = new_record(question)
+    start = time.time()
+
+    try:
+        target, query, query_type, metadata = compile_question(
+            question, record["timings"])
+    except Exception as error:
+        record["error"] = error_message(error)
+        return record
+
+    record["target"] = target
+    record["query"] = query
+    record["query_type"] = query_type
+    record["metadata"] = metadata
+    record["deadline"] = question_deadline(start, query_type)
+    return record
+
+
+def render_record(record, results):
+    """
+    Fills `record` with the answers formatted from `results` and returns
+    it ready to be serialized as JSON.
+    """
+
+    metadata = record.pop("metadata")
+    timings = record.pop("timings")
+    record.pop("deadline")
+    record["answers"] = []
+
+    # Without bindings there's nothing to render, as in the CLI.
+    if results is not None and results["results"]["bindings"]:
+        handler = format_handlers[record["query_type"]]
+        try:
+            with timings.stage("rendering"):
+                record["answers"] = handler(results, record["target"],
+                                            metadata)
+        except Exception as error:
+            record["error"] = error_message(error)
+
+    if results is not None:
+        cursor = getattr(results["results"]["bindings"], "cursor", None)
+        if cursor is not None:
+            record["cursor"] = cursor
+        if "count" in results["head"]:
+            record["count"] = results["head"]["count"]
+
+    slow_log.report(timings)
+    return record
+
+
+def answer_question(question):
+    """
+    Answers `question` in the calling thread, returning the same object
+    `answer_batch` writes for it.
+    """
+
+    record = compile_record(question)
+    results = None
+    if record["query"] is not None:
+        try:
+            results = run_query(record["query"], record["query_type"],
+                                record["timings"], record["target"],
+                                record["deadline"])
+        except Exception as error:
+            record["error"] = error_message(error)
+    return render_record(record, results)
+
+
+def iter_compiled(questions, pool, dedup_size=DEDUP_SIZE,
+                  combine_size=COMBINE_SIZE, streams=None):
+    """
+    Compiles `questions` and submits their queries to `pool`, yielding a
+    `(record, task)` pair per question. Questions whose query was one of
+    the last `dedup_size` distinct queries share its task, unless its
+    results are streamed. Queries that aren't streamed are sent
+    `combine_size` per request, the pairs are yielded once their batch
+    is submitted, which is done before MAX_WAITING questions wait on it. Streamed queries go
+    through the `streams` `Gate`, if given, which must be released once
+    their results are read.
+    """
+
+    recent = OrderedDict()
+    batch = QueryBatch()
+    compiled = []
+
+    for question in questions:
+        record = compile_record(question)
+        query = record["query"]
+        query_type = record["query_type"]
+        task = None
+
+        if query is not None and query_type in STREAMED_TYPES:
+            args = (query, query_type, record["timings"], record["target"],
+                    record["deadline"])
+            if streams is None:
+                task = pool.submit(run_query, *args)
+            else:
+                task = streams.submit(run_query, *args)
+        elif query is not None:
+            task = recent.pop(query, None)
+            if task is None:
+                task = batch.add(query, query_type, record["timings"],
+                                 record["deadline"])
+            else:
+                record["timings"].note(shared_query=True)
+            recent[query] = task
+            if len(recent) > dedup_size:
+                recent.popitem(last=False)
+
+        compiled.append((record, task))
+        # A batch left open while repeated or streamed queries follow
+        # would hold their questions back, it's sent half full then.
+        if len(batch) >= combine_size or \
+                len(compiled) >= max(combine_size, MAX_WAITING):
+            batch.submit(pool, sparql)
+            batch = QueryBatch()
+        if not batch:
+            for item in compiled:
+                yield item
+            compiled = []
+
+    if batch:
+        batch.submit(pool, sparql)
+    for item in compiled:
+        yield item
+
+
+def iter_results(questions, workers=QUERY_WORKERS, dedup_size=DEDUP_SIZE,
+                 combine_size=COMBINE_SIZE):
+    """
+    Yields a `(record, results)` pair per question, in input order, while
+    up to `workers` requests run concurrently. Later questions are
+    compiled while earlier queries are in flight. `results` is None when
+    no query was sent or it failed, in which case `record` has an
+    "error".
+    """
+
+    pool = WorkerPool(workers)
+    streams = Gate(pool, STREAMS_AHEAD)
+    compiled = iter_compiled(questions, pool, dedup_size, combine_size,
+                             streams)
+
+    try:
+        for record, task in ordered(compiled, workers * 2 * combine_size):
+            results = None
+            if task is not None:
+                try:
+                    results = task.result()
+                except Exception as error:
+                    record["error"] = error_message(error)
+            yield record, results
+            if task is not None and record["query_type"] in STREAMED_TYPES:
+                streams.release()
+    finally:
+        pool.close()
+
+
+def answer_batch(questions, output, workers=QUERY_WORKERS,
+                 combine_size=COMBINE_SIZE):
+    """
+    Answers the `questions` iterable writing one JSON object per question
+    to `output`, in input order and as soon as it's answered, so memory
+    doesn't grow with the input.
+    """
+
+    for record, results in iter_results(questions, workers,
+                                        combine_size=combine_size):
+        record = render_record(record, results)
+        output.write(json.dumps(record) + "\n")
 
 
 if __name__ == "__main__":
@@ -159,11 +725,132 @@ if __name__ == "__main__":
         quepy.set_loglevel("DEBUG")
         sys.argv.remove("-d")
 
+    endpoints = []
+    while "--endpoint" in sys.argv:
+        i = sys.argv.index("--endpoint")
+        endpoints.append(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+
+    mirror = SPARQL_MIRROR
+    if "--mirror" in sys.argv:
+        i = sys.argv.index("--mirror")
+        mirror = sys.argv[i + 1]
+        del sys.argv[i:i + 2]
+
+    if endpoints or mirror != SPARQL_MIRROR:
+        sparql = connect(endpoints or SPARQL_ENDPOINTS, mirror)
+
+    if "--slow-log" in sys.argv:
+        i = sys.argv.index("--slow-log")
+        slow_log = SlowLog(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+
+    if "--page-size" in sys.argv:
+        i = sys.argv.index("--page-size")
+        PAGE_SIZE = int(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+
+    if "--offset" in sys.argv:
+        i = sys.argv.index("--offset")
+        FIRST_OFFSET = int(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+
+    if "--pages" in sys.argv:
+        i = sys.argv.index("--pages")
+        MAX_PAGES = int(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+
+    if "--count" in sys.argv:
+        sys.argv.remove("--count")
+        COUNT_FIRST = True
+
+    workers = QUERY_WORKERS
+    if "--workers" in sys.argv:
+        i = sys.argv.index("--workers")
+        workers = int(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+
+    group_size = WIKIPEDIA_GROUP_SIZE
+    if "--group-size" in sys.argv:
+        i = sys.argv.index("--group-size")
+        group_size = int(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+
+    if "--wikipedia" in sys.argv:
+        sys.argv.remove("--wikipedia")
+
+        if len(sys.argv) > 1 and sys.argv[1] != "-":
+            stream = open(sys.argv[1])
+        else:
+            stream = sys.stdin
+
+        urls = (decode_input(url) for url in iter_questions(stream))
+        misses = resolve_wikipedia_batch(urls, sys.stdout, group_size,
+                                         workers)
+        sys.stderr.write("{0} URLs not found\n".format(misses))
+        sparql.close()
+        sys.exit(0)
+
+    if "--combine" in sys.argv:
+        i = sys.argv.index("--combine")
+        COMBINE_SIZE = int(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+
+    if "--sweep" in sys.argv:
+        i = sys.argv.index("--sweep")
+        try:
+            template = dbpedia.get_template(sys.argv[i + 1])
+        except KeyError:
+            sys.stderr.write("No template called {0}, they are:\n{1}\n".format(
+                sys.argv[i + 1], "\n".join(sorted(
+                    type(rule).__name__ for rule in dbpedia.rules))))
+            sys.exit(1)
+        del sys.argv[i:i + 2]
+
+        if len(sys.argv) > 1 and sys.argv[1] != "-":
+            stream = open(sys.argv[1])
+        else:
+            stream = sys.stdin
+
+        names = [decode_input(name) for name in iter_questions(stream)]
+        try:
+            table = sweep_template(template, names, workers)
+        except SweepError as error:
+            sys.stderr.write(u"{0}\n".format(error).encode("utf-8"))
+            sys.exit(1)
+        for record in table:
+            sys.stdout.write(json.dumps(record) + "\n")
+        sparql.close()
+        sys.exit(0)
+
+    if "--batch" in sys.argv:
+        sys.argv.remove("--batch")
+
+        if len(sys.argv) > 1 and sys.argv[1] != "-":
+            stream = open(sys.argv[1])
+        else:
+            stream = sys.stdin
+
+        answer_batch(iter_questions(stream), sys.stdout, workers,
+                      COMBINE_SIZE)
+        sys.stderr.write("Result cache: {hits} hits, {misses} misses, "
+                         "{disk_hits} from disk\n".format(
+                             **sparql.cache.stats()))
+        sys.stderr.write("Queries: {calls} sent, {coalesced} coalesced\n"
+                         .format(**sparql.flights.stats()))
+        sparql.close()
+        slow_log.close()
+        sys.exit(0)
+
     if len(sys.argv) > 1:
         question = " ".join(sys.argv[1:])
 
         if question.count("wikipedia.org"):
-            print wikipedia2dbpedia(sys.argv[1])
+            dbpedia_url = wikipedia2dbpedia(decode_input(sys.argv[1]))
+            if dbpedia_url is None:
+                print "Snorql URL not found"
+                sys.exit(1)
+            print dbpedia_url.encode(locale_encoding())
             sys.exit(0)
         else:
             questions = [question]
@@ -178,36 +865,40 @@ if __name__ == "__main__":
         "age": print_age,
     }
 
-    for question in questions:
-        print question
-        print "-" * len(question)
+    for record, results in iter_results(questions, workers):
+        try:
+            question = record["question"]
+            print question
+            print "-" * len(question)
 
-        target, query, metadata = dbpedia.get_query(question)
-
-        if isinstance(metadata, tuple):
-            query_type = metadata[0]
-            metadata = metadata[1]
-        else:
-            query_type = metadata
-            metadata = None
+            if record["query"] is None:
+                print "Query not generated :(\n"
+                continue
 
-        if query is None:
-            print "Query not generated :(\n"
-            continue
+            print record["query"]
 
-        print query
+            if results is None:
+                print "Query failed: {}\n".format(record["error"])
+                continue
 
-        if target.startswith("?"):
-            target = target[1:]
-        if query:
-            sparql.setQuery(query)
-            sparql.setReturnFormat(JSON)
-            results = sparql.query().convert()
+            if "count" in results["head"]:
+                print "{0} answers\n".format(results["head"]["count"])
 
-            if not results["results"]["bindings"]:
+            bindings = results["results"]["bindings"]
+            cursor = getattr(bindings, "cursor", None)
+            if not bindings and cursor is None:
                 print "No answer found :("
                 continue
 
-        print_handlers[query_type](results, target, metadata)
-        print
-
+            if bindings:
+                with record["timings"].stage("rendering"):
+                    print_handlers[record["query_type"]](results,
+                                                         record["target"],
+                                                         record["metadata"])
+                print
+
+            cursor = getattr(bindings, "cursor", None)
+            if cursor is not None:
+                print "More answers with --offset {0}\n".format(cursor)
+        finally:
+            slow_log.report(record["timings"])
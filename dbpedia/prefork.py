@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Pre-fork launcher for the answering service (see server.py).
+
+The parent loads the templates, the synonym expansions and the tagger
+models once, then forks `--processes` workers serving the same socket, so
+they share those pages copy-on-write. Workers that die are replaced. The
+memory of every worker is reported once they are up and then every
+`--report-every` seconds (0 to report only once):
+
+    python prefork.py [--processes 4] [--host localhost] [--port 8000]
+        [--workers 8] [--queue-size 64] [--endpoint URL]... [--mirror URL]
+        [--slow-log FILE] [--report-every 60]
+
+Private memory is what each extra worker costs, shared memory is paid
+once. The numbers come from /proc/PID/smaps (Linux only).
+
+Files aren't shared: each worker slot writes its own SPARQL_CACHE_PATH
+shelve and slow log, named after them with the slot number appended
+(".0", ".1", ...). A worker replacing a dead one reuses its files.
+"""
+
+import os
+import gc
+import sys
+import time
+import signal
+import argparse
+
+import main
+from dbpedia import settings
+from dbpedia.timing import SlowLog
+from server import AnswerServer, SERVER_WORKERS, QUEUE_SIZE
+
+
+def process_memory(pid):
+    """
+    Returns the rss, pss, shared and private memory of process `pid` in
+    kB, or None if it can't be read.
+    """
+
+    memory = {"rss": 0, "pss": 0, "shared": 0, "private": 0}
+    fields = {
+        "Rss:": "rss",
+        "Pss:": "pss",
+        "Shared_Clean:": "shared",
+        "Shared_Dirty:": "shared",
+        "Private_Clean:": "private",
+        "Private_Dirty:": "private",
+    }
+    try:
+        with open("/proc/{0}/smaps".format(pid)) as smaps:
+            for line in smaps:
+                parts = line.split()
+                if parts and parts[0] in fields:
+                    memory[fields[parts[0]]] += int(parts[1])
+    except IOError:
+        return None
+    return memory
+
+
+def report_memory(parent, workers, output=sys.stderr):
+    rows = [("parent", parent)] + [("worker", pid) for pid in workers]
+    total = 0
+    output.write("{:<8} {:>7} {:>10} {:>10} {:>10} {:>10}\n".format(
+        "", "pid", "rss kB", "pss kB", "shared kB", "private kB"))
+    for name, pid in rows:
+        memory = process_memory(pid)
+        if memory is None:
+            output.write("{:<8} {:>7} memory not available\n".format(
+                name, pid))
+            continue
+        total += memory["pss"]
+        output.write("{:<8} {:>7} {rss:>10} {pss:>10} {shared:>10} "
+                     "{private:>10}\n".format(name, pid, **memory))
+    output.write("total pss {0} kB\n".format(total))
+    output.flush()
+
+
+def freeze():
+    """
+    Collects the garbage of loading so it doesn't get copied into the
+    workers, and keeps the collector away from the loaded objects where
+    the interpreter allows it.
+    """
+
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+
+def worker_path(path, slot):
+    """
+    Returns the file of worker `slot` for the shared setting `path`.
+    """
+
+    if path is None:
+        return None
+    return "{0}.{1}".format(path, slot)
+
+
+def run_worker(server, slot, endpoints, mirror, slow_log):
+    """
+    Serves until killed, never returns.
+    """
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # Sockets, cache files and log files aren't shared with the parent or
+    # the other workers.
+    main.sparql = main.connect(
+        endpoints, mirror, worker_path(settings.SPARQL_CACHE_PATH, slot))
+    main.slow_log = SlowLog(worker_path(slow_log, slot))
+
+    server.start_workers()
+    server.ready.set()
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(1)
+
+
+def fork_worker(server, slot, endpoints, mirror, slow_log):
+    pid = os.fork()
+    if pid == 0:
+        run_worker(server, slot, endpoints, mirror, slow_log)
+    return pid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--endpoint", action="append", dest="endpoints",
+                        help="repeat to balance queries over mirrors")
+    parser.add_argument("--mirror", default=settings.SPARQL_MIRROR)
+    parser.add_argument("--slow-log")
+    parser.add_argument("--report-every", type=float, default=60)
+    args = parser.parse_args()
+    endpoints = args.endpoints or settings.SPARQL_ENDPOINTS
+    slow_log = args.slow_log or settings.SLOW_LOG_PATH
+
+    # The workers open their own, see run_worker.
+    main.sparql.close()
+    main.slow_log.close()
+
+    start = time.time()
+    main.dbpedia.load()
+    freeze()
+    sys.stderr.write("Loaded in {0:.1f}s\n".format(time.time() - start))
+
+    server = AnswerServer((args.host, args.port), args.workers,
+                          args.queue_size)
+    # Worker pid: its slot.
+    workers = {}
+    for slot in xrange(args.processes):
+        pid = fork_worker(server, slot, endpoints, args.mirror, slow_log)
+        workers[pid] = slot
+    print "Answering questions at {0} with {1} processes".format(
+        server.url, args.processes)
+    sys.stdout.flush()
+
+    def stop(signum, frame):
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # Give the workers a moment to start serving before the first report.
+    time.sleep(1)
+    report_memory(os.getpid(), sorted(workers))
+    last_report = time.time()
+
+    while True:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid in workers:
+            sys.stderr.write("Worker {0} exited ({1}), restarting\n".format(
+                pid, status))
+            slot = workers.pop(pid)
+            pid = fork_worker(server, slot, endpoints, args.mirror, slow_log)
+            workers[pid] = slot
+            continue
+
+        if args.report_every and \
+                time.time() - last_report >= args.report_every:
+            report_memory(os.getpid(), sorted(workers))
+            last_report = time.time()
+        time.sleep(0.5)
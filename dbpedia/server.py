@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+HTTP answering service for DBpedia quepy.
+
+Loads the templates and the tagger once and answers questions with the
+JSON objects of ``main.py --batch``:
+
+    python server.py [--host localhost] [--port 8000] [--workers 8]
+        [--queue-size 64] [--endpoint URL]... [--mirror URL]
+        [--slow-log FILE]
+
+    GET  /answer?q=Who+is+Tom+Cruise
+    POST /answer  {"question": "Who is Tom Cruise?"}
+    GET  /health  200 while the process is up, with the queries sent,
+                  those coalesced with an identical one in flight and
+                  the class and stats of the SPARQL client (the state
+                  of each endpoint, or the hedging with a mirror)
+    GET  /ready   200 once the templates are loaded, 503 before
+
+Connections are answered by a fixed number of worker threads. Those that
+arrive while `--queue-size` connections are waiting get a 503 right away.
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+import BaseHTTPServer
+from Queue import Queue, Full
+from urlparse import urlsplit, parse_qs
+
+import main
+from dbpedia import settings
+from dbpedia.timing import SlowLog
+
+SERVER_WORKERS = 8
+QUEUE_SIZE = 64
+
+_busy_response = ("HTTP/1.0 503 Service Unavailable\r\n"
+                  "Content-Type: application/json\r\n"
+                  "Connection: close\r\n\r\n"
+                  '{"error": "Too many requests queued"}')
+
+
+class AnswerHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    server_version = "DBpediaQuepy/0.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            self._send(200, self.server.health())
+        elif url.path == "/ready":
+            ready = self.server.ready.is_set()
+            self._send(200 if ready else 503, {"ready": ready})
+        elif url.path == "/answer":
+            self._answer(parse_qs(url.query).get("q", [None])[0])
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/answer":
+            self._send(404, {"error": "Not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            question = json.loads(self.rfile.read(length))["question"]
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {"error": "Expected {\"question\": ...}"})
+            return
+        self._answer(question)
+
+    def _answer(self, question):
+        if question is not None and not isinstance(question, basestring):
+            self._send(400, {"error": "The question must be a string"})
+            return
+        if not question or not question.strip():
+            self._send(400, {"error": "Missing question"})
+            return
+        if not self.server.ready.is_set():
+            self._send(503, {"error": "Loading"})
+            return
+
+        if isinstance(question, str):
+            question = question.decode("utf-8")
+        self._send(200, main.answer_question(question.strip()))
+
+    def _send(self, status, document):
+        body = json.dumps(document)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AnswerServer(BaseHTTPServer.HTTPServer):
+    """
+    HTTP server handing connections to `workers` threads through a queue
+    holding up to `queue_size` of them, once `start_workers` is called.
+    `ready` is set when the templates are loaded, see `load`.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, address, workers=SERVER_WORKERS,
+                 queue_size=QUEUE_SIZE):
+        BaseHTTPServer.HTTPServer.__init__(self, address, AnswerHandler)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ready = threading.Event()
+        self.rejected = 0
+        self._requests = Queue(queue_size)
+
+    def start_workers(self):
+        for _ in xrange(self.workers):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return "http://{0}:{1}".format(host, port)
+
+    def load(self):
+        """
+        Loads the templates and the tagger from a daemon thread.
+        """
+
+        def load():
+            main.dbpedia.load()
+            self.ready.set()
+
+        thread = threading.Thread(target=load)
+        thread.daemon = True
+        thread.start()
+
+    def health(self):
+        health = {
+            "status": "ok",
+            "pid": os.getpid(),
+            "ready": self.ready.is_set(),
+            "workers": self.workers,
+            "queued": self._requests.qsize(),
+            "rejected": self.rejected,
+            "queries": main.sparql.flights.stats(),
+        }
+        client = main.sparql.client
+        if hasattr(client, "stats"):
+            health["client"] = {"class": type(client).__name__,
+                                "stats": client.stats()}
+        return health
+
+    def process_request(self, request, client_address):
+        try:
+            self._requests.put_nowait((request, client_address))
+        except Full:
+            self.rejected += 1
+            try:
+                request.sendall(_busy_response)
+            finally:
+                self.shutdown_request(request)
+
+    def _work(self):
+        while True:
+            request, client_address = self._requests.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--endpoint", action="append", dest="endpoints",
+                        help="repeat to balance queries over mirrors")
+    parser.add_argument("--mirror", default=settings.SPARQL_MIRROR)
+    parser.add_argument("--slow-log")
+    args = parser.parse_args()
+
+    if args.endpoints or args.mirror != settings.SPARQL_MIRROR:
+        endpoints = args.endpoints or settings.SPARQL_ENDPOINTS
+        main.sparql = main.connect(endpoints, args.mirror)
+    if args.slow_log:
+        main.slow_log = SlowLog(args.slow_log)
+
+    server = AnswerServer((args.host, args.port), args.workers,
+                          args.queue_size)
+    server.start_workers()
+    server.load()
+
+    print "Answering questions at {0}".format(server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        main.sparql.close()
+        main.slow_log.close()
+        sys.exit(0)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Local stand-in for a SPARQL endpoint, for offline benchmarks.
+
+It answers the SPARQL protocol (GET or POST) with results recorded from
+earlier real runs, keyed by query, and can add latency and errors:
+
+    python sparql_stub.py recordings.jsonl [--port 8890] [--latency 0.05]
+        [--jitter 0.02] [--error-rate 0.01] [--seed 1]
+
+With --record the stub forwards the queries it doesn't know to a real
+endpoint and appends the answers to the recordings file:
+
+    python sparql_stub.py recordings.jsonl --record http://dbpedia.org/sparql
+
+Queries combined by main.py --batch are answered from the recordings of
+the queries they combine, so record with --combine 1 and replay with any.
+
+Then point main.py at it with --endpoint http://localhost:8890/sparql.
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import BaseHTTPServer
+import SocketServer
+from urlparse import urlsplit, parse_qs
+
+from dbpedia.cache import normalize_query
+from dbpedia.combine import uncombine_query, TAG
+from dbpedia.client import SparqlClient, SparqlError
+
+RESULTS_TYPE = "application/sparql-results+json"
+
+
+def load_recordings(path):
+    """
+    Returns the ``{normalized query: (status, body)}`` recorded at `path`,
+    a file with one JSON object per line.
+    """
+
+    recordings = {}
+    try:
+        with open(path) as stream:
+            for line in stream:
+                if line.strip():
+                    entry = json.loads(line)
+                    key = normalize_query(entry["query"])
+                    recordings[key] = (entry["status"], entry["body"])
+    except IOError:
+        pass
+    return recordings
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, with Nagle on every kept
+    # alive request would wait for the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/stats":
+            self._send(200, json.dumps(self.server.stats()),
+                       "application/json")
+            return
+        self._answer(parse_qs(url.query).get("query", [None])[0])
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.headers.get("Content-Type", "").startswith(
+                "application/sparql-query"):
+            query = body
+        else:
+            query = parse_qs(body).get("query", [None])[0]
+        self._answer(query)
+
+    def _answer(self, query):
+        if query is None:
+            self._send(400, "Missing query", "text/plain")
+            return
+        status, body = self.server.answer(query.decode("utf-8"))
+        self._send(status, body, RESULTS_TYPE if status == 200
+                   else "text/plain")
+
+    def _send(self, status, body, content_type):
+        if isinstance(body, unicode):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubEndpoint(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Threaded HTTP server replaying `recordings`. Each answer is delayed
+    `latency` seconds plus up to `jitter` more, and a fraction
+    `error_rate` of them are 500 errors. If `upstream` is a SPARQL client,
+    unknown queries are forwarded to it and recorded into `record_path`,
+    those it fails to answer get a 502. Combined queries whose queries
+    are all recorded are answered without being forwarded.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, recordings, latency=0, jitter=0,
+                 error_rate=0, seed=None, upstream=None, record_path=None):
+        BaseHTTPServer.HTTPServer.__init__(self, address, StubHandler)
+        self.recordings = recordings
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.upstream = upstream
+        self.record_path = record_path
+        self.counts = {"hits": 0, "misses": 0, "errors": 0, "recorded": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return "http://{0}:{1}/sparql".format(host, port)
+
+    def answer(self, query):
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            self._count("errors")
+            return 500, "Injected error"
+
+        key = normalize_query(query)
+        if key in self.recordings:
+            self._count("hits")
+            return self.recordings[key]
+
+        combined = self.answer_combined(query)
+        if combined is not None:
+            self._count("hits")
+            return combined
+
+        if self.upstream is None:
+            self._count("misses")
+            return 404, "Query not recorded"
+
+        try:
+            status, body = 200, json.dumps(self.upstream.query(query))
+        except SparqlError as error:
+            status, body = error.status, error.body
+        except Exception as error:
+            # Not the query's answer, so not recorded.
+            self._count("errors")
+            return 502, "Upstream failed: {0}".format(error)
+        self.record(query, status, body)
+        return status, body
+
+    def answer_combined(self, query):
+        """
+        Returns the answer to the combined `query` made of the recorded
+        answers to its queries, or None if any isn't a recorded success.
+        """
+
+        queries = uncombine_query(query)
+        if queries is None:
+            return None
+        answers = [self.recordings.get(normalize_query(x)) for x in queries]
+        if any(x is None or x[0] != 200 for x in answers):
+            return None
+
+        variables, bindings = [], []
+        for index, (_, body) in enumerate(answers):
+            results = json.loads(body)
+            variables.extend(x for x in results["head"].get("vars", [])
+                             if x not in variables)
+            for binding in results["results"]["bindings"]:
+                binding[TAG] = {"type": "literal", "value": unicode(index)}
+                bindings.append(binding)
+        return 200, json.dumps({"head": {"vars": variables + [TAG]},
+                                "results": {"bindings": bindings}})
+
+    def record(self, query, status, body):
+        with self._lock:
+            self.recordings[normalize_query(query)] = (status, body)
+            self.counts["recorded"] += 1
+            if self.record_path is not None:
+                with open(self.record_path, "a") as stream:
+                    entry = {"query": query, "status": status, "body": body}
+                    stream.write(json.dumps(entry) + "\n")
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def start(self):
+        """
+        Serves from a daemon thread and returns the endpoint URL.
+        """
+
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("recordings")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8890)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--record", metavar="UPSTREAM")
+    args = parser.parse_args()
+
+    upstream = None
+    if args.record:
+        upstream = SparqlClient(args.record)
+
+    server = StubEndpoint((args.host, args.port),
+                          load_recordings(args.recordings),
+                          latency=args.latency, jitter=args.jitter,
+                          error_rate=args.error_rate, seed=args.seed,
+                          upstream=upstream, record_path=args.recordings)
+
+    print "Serving {0} recorded queries at {1}".format(
+        len(server.recordings), server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,7 @@
+# coding: utf-8
+
+"""
+Tests for DBpedia quepy, run from the directory holding main.py:
+
+    python -m unittest discover tests
+"""
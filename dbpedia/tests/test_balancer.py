@@ -0,0 +1,128 @@
+# coding: utf-8
+
+import socket
+import unittest
+
+from dbpedia.balancer import BalancedClient
+from dbpedia.client import SparqlError, DeadlineExceeded
+
+RESULTS = {"head": {}, "results": {"bindings": []}}
+
+
+class FakeClient(object):
+    """
+    Answers every query, or raises `error` while it's set.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.error = None
+        self.sent = 0
+
+    def query(self, query, deadline=None):
+        self.sent += 1
+        if self.error is not None:
+            raise self.error
+        return RESULTS
+
+    def query_stream(self, query, deadline=None):
+        self.query(query, deadline)
+        return {"head": {}, "results": {"bindings": iter([{}, {}])}}
+
+    def close(self):
+        pass
+
+
+class BalancedClientTest(unittest.TestCase):
+    def setUp(self):
+        self.a = FakeClient("a")
+        self.b = FakeClient("b")
+        self.client = self.balanced()
+
+    def balanced(self, health_interval=3600):
+        # Health checks are run by hand.
+        client = BalancedClient([self.a, self.b], eject_failures=2,
+                                health_interval=health_interval)
+        self.addCleanup(client.close)
+        return client
+
+    def backend(self, fake):
+        return self.client.backends[[self.a, self.b].index(fake)]
+
+    def test_spread(self):
+        for _ in xrange(10):
+            self.client.query(u"q")
+        self.assertEqual((self.a.sent, self.b.sent), (5, 5))
+
+    def test_failed_query_sent_to_another(self):
+        self.a.error = socket.error("Connection refused")
+        for _ in xrange(2):
+            self.assertEqual(self.client.query(u"q"), RESULTS)
+        self.assertEqual(self.backend(self.a).failures, 1)
+
+    def test_ejection(self):
+        self.a.error = SparqlError(503, "Unavailable", "")
+        for _ in xrange(4):
+            self.client.query(u"q")
+        self.assertTrue(self.backend(self.a).ejected)
+        self.assertEqual(self.a.sent, 2)
+
+        for _ in xrange(4):
+            self.client.query(u"q")
+        self.assertEqual(self.a.sent, 2)
+
+    def test_readmitted_by_health_check(self):
+        self.a.error = SparqlError(503, "Unavailable", "")
+        for _ in xrange(4):
+            self.client.query(u"q")
+        self.client.check()
+        self.assertTrue(self.backend(self.a).ejected)
+
+        self.a.error = None
+        self.client.check()
+        self.assertFalse(self.backend(self.a).ejected)
+        self.assertEqual(self.backend(self.a).ejections, 1)
+
+    def test_idle_endpoint_ejected_by_health_check(self):
+        self.a.error = socket.timeout("timed out")
+        self.client.check()
+        self.assertTrue(self.backend(self.a).ejected)
+        self.assertFalse(self.backend(self.b).ejected)
+
+    def test_query_errors_arent_the_endpoint_fault(self):
+        for error in [SparqlError(400, "Bad Request", ""),
+                      DeadlineExceeded("Deadline exceeded")]:
+            self.a.error = self.b.error = error
+            for _ in xrange(4):
+                self.assertRaises(type(error), self.client.query, u"q")
+        self.assertEqual(self.a.sent + self.b.sent, 8)
+        self.assertEqual(self.backend(self.a).failures, 0)
+        self.assertFalse(self.backend(self.a).ejected)
+
+    def test_all_ejected(self):
+        self.a.error = self.b.error = socket.error("Connection refused")
+        for _ in xrange(4):
+            self.assertRaises(socket.error, self.client.query, u"q")
+        self.assertTrue(self.backend(self.a).ejected)
+        self.assertTrue(self.backend(self.b).ejected)
+
+        self.a.error = self.b.error = None
+        self.assertEqual(self.client.query(u"q"), RESULTS)
+
+    def test_no_ejection_without_health_checks(self):
+        client = self.balanced(health_interval=0)
+        self.a.error = socket.error("Connection refused")
+        for _ in xrange(4):
+            client.query(u"q")
+        self.assertFalse(client.backends[0].ejected)
+
+    def test_streams_keep_the_endpoint_busy(self):
+        results = self.client.query_stream(u"q")
+        busy = [x for x in self.client.backends if x.outstanding]
+        self.assertEqual(len(busy), 1)
+        self.assertEqual(len(list(results["results"]["bindings"])), 2)
+        self.assertEqual(busy[0].outstanding, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+# coding: utf-8
+
+import unittest
+
+from dbpedia.app import install
+from dbpedia.cache import canonical_question
+
+
+class CanonicalQuestionTest(unittest.TestCase):
+    def test_whitespace_and_punctuation(self):
+        self.assertEqual(canonical_question(u"  who directed\tPocahontas ?"),
+                         u"who directed Pocahontas")
+
+    def test_case_is_kept(self):
+        self.assertNotEqual(canonical_question(u"who directed pocahontas?"),
+                            canonical_question(u"Who directed Pocahontas?"))
+
+
+class CompileCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.app = install()
+        self.compiled = []
+
+        def get_query(question, timings, words=None):
+            self.compiled.append(question)
+            return u"?x0", u"query of {0}".format(question), None
+
+        self.app._get_query = get_query
+
+    def test_case_compiles_separately(self):
+        lower = self.app.get_query(u"who directed pocahontas?")
+        title = self.app.get_query(u"Who directed Pocahontas?")
+        self.assertEqual(self.compiled, [u"who directed pocahontas?",
+                                         u"Who directed Pocahontas?"])
+        self.assertNotEqual(lower, title)
+
+    def test_whitespace_is_cached(self):
+        self.app.get_query(u"Who directed Pocahontas?")
+        self.app.get_query(u"Who  directed Pocahontas")
+        self.assertEqual(len(self.compiled), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
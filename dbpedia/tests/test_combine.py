@@ -0,0 +1,110 @@
+# coding: utf-8
+
+import time
+import unittest
+
+from dbpedia.client import DeadlineExceeded
+from dbpedia.combine import combine_queries, split_results, \
+    query_combined, QueryBatch
+from dbpedia.executor import WorkerPool
+
+QUERIES = [
+    u"PREFIX foaf: <http://xmlns.com/foaf/0.1/>\n"
+    u"SELECT DISTINCT ?x1 WHERE { ?x0 foaf:name ?x1. }",
+    u"SELECT ?x2 WHERE { ?x0 ?p ?x2. }",
+]
+
+
+def literal(value):
+    return {"type": "literal", "value": value}
+
+
+class FakeClient(object):
+    """
+    Answers combined queries with a binding per branch, fails the
+    queries in `failing`.
+    """
+
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.sent = []
+
+    def query(self, query, deadline=None):
+        self.sent.append(query)
+        if query in self.failing or (u"UNION" in query and self.failing):
+            raise ValueError(query)
+        if u"UNION" in query:
+            bindings = [{"x1": literal(u"a"), "combined": literal(u"0")},
+                        {"x2": literal(u"b"), "combined": literal(u"1")},
+                        {"x2": literal(u"c"), "combined": literal(u"1")}]
+        else:
+            bindings = [{"x": literal(query)}]
+        return {"head": {"vars": []}, "results": {"bindings": bindings}}
+
+    def query_many(self, queries, query_types=None, deadline=None):
+        self.deadline = deadline
+        return query_combined(self, queries, deadline)
+
+
+class CombineTest(unittest.TestCase):
+    def test_combine(self):
+        combined = combine_queries(QUERIES)
+        self.assertTrue(combined.startswith(
+            u"PREFIX foaf: <http://xmlns.com/foaf/0.1/>\n"))
+        self.assertEqual(combined.count(u"UNION"), 1)
+        self.assertIn(u"BIND(1 AS ?combined)", combined)
+
+    def test_not_combined(self):
+        self.assertIsNone(combine_queries([QUERIES[0], u"ASK { ?s ?p ?o }"]))
+        self.assertIsNone(combine_queries([
+            QUERIES[0],
+            u"PREFIX foaf: <http://example.org/>\nSELECT ?x WHERE {}"]))
+
+    def test_split(self):
+        results = FakeClient().query(combine_queries(QUERIES))
+        first, second = split_results(results, QUERIES)
+        self.assertEqual(first["head"]["vars"], [u"x1"])
+        self.assertEqual(first["results"]["bindings"], [{"x1": literal(u"a")}])
+        self.assertEqual(second["head"]["vars"], [u"x2"])
+        self.assertEqual(len(second["results"]["bindings"]), 2)
+
+    def test_sent_alone_if_combined_fails(self):
+        client = FakeClient(failing=[QUERIES[1]])
+        (first, error), (second, failure) = query_combined(client, QUERIES)
+        self.assertEqual(len(client.sent), 3)
+        self.assertIsNone(error)
+        self.assertEqual(first["results"]["bindings"],
+                         [{"x": literal(QUERIES[0])}])
+        self.assertIsNone(second)
+        self.assertIs(failure[0], ValueError)
+
+
+class QueryBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(1)
+        self.addCleanup(self.pool.close)
+
+    def test_members_keep_their_deadlines(self):
+        client = FakeClient()
+        batch = QueryBatch()
+        now = time.time()
+        early = batch.add(QUERIES[0], deadline=now - 1)
+        late = batch.add(QUERIES[1], deadline=now + 60)
+        batch.submit(self.pool, client)
+
+        self.assertRaises(DeadlineExceeded, early.result, 1)
+        self.assertEqual(len(late.result(1)["results"]["bindings"]), 2)
+        self.assertEqual(client.deadline, now + 60)
+
+    def test_no_deadline(self):
+        client = FakeClient()
+        batch = QueryBatch()
+        batch.add(QUERIES[0], deadline=time.time() + 60)
+        task = batch.add(QUERIES[1])
+        batch.submit(self.pool, client)
+        task.result(1)
+        self.assertIsNone(client.deadline)
+
+
+if __name__ == "__main__":
+    unittest.main()
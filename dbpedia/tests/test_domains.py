@@ -0,0 +1,33 @@
+# coding: utf-8
+
+import unittest
+
+import quepy
+
+import dbpedia
+from dbpedia import settings
+from dbpedia.app import install
+
+
+class DomainsTest(unittest.TestCase):
+    def test_enabled_domains_are_exposed(self):
+        modules = set(type(rule).__module__
+                      for rule in quepy.install("dbpedia").rules)
+        self.assertEqual(modules, set("dbpedia.{0}".format(x)
+                                      for x in settings.DOMAINS))
+
+    def test_same_templates_as_quepy(self):
+        names = [type(rule).__name__
+                 for rule in quepy.install("dbpedia").rules]
+        self.assertTrue(names)
+        self.assertEqual([type(rule).__name__ for rule in install().rules],
+                         names)
+
+    def test_later_domains_shadow(self):
+        # Defined in both, populated_place comes later.
+        self.assertEqual(dbpedia.PopulationOfQuestion.__module__,
+                         "dbpedia.populated_place")
+
+
+if __name__ == "__main__":
+    unittest.main()
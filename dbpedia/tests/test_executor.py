@@ -0,0 +1,48 @@
+# coding: utf-8
+
+import threading
+import unittest
+
+from dbpedia.executor import WorkerPool, Gate
+
+
+class GateTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(4)
+        self.addCleanup(self.pool.close)
+        self.gate = Gate(self.pool, 2)
+        self.go = threading.Event()
+        self.addCleanup(self.go.set)
+
+    def submit(self, n):
+        return [self.gate.submit(self.go.wait) for _ in xrange(n)]
+
+    def test_holds_up_to_the_limit(self):
+        tasks = self.submit(4)
+        self.assertEqual([x.started() for x in tasks],
+                         [True, True, False, False])
+        self.assertEqual(self.gate.held, 2)
+
+    def test_release_starts_the_next(self):
+        tasks = self.submit(4)
+        self.gate.release()
+        self.assertEqual([x.started() for x in tasks],
+                         [True, True, True, False])
+        self.assertEqual(self.gate.held, 2)
+
+    def test_waiting_starts_out_of_turn(self):
+        tasks = self.submit(4)
+        self.go.set()
+        self.assertTrue(tasks[3].wait(1))
+        self.assertFalse(tasks[2].started())
+        self.assertEqual(self.gate.held, 3)
+
+        # The one started out of turn is skipped.
+        self.gate.release()
+        self.gate.release()
+        self.assertTrue(tasks[2].started())
+        self.assertEqual(self.gate.held, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# coding: utf-8
+
+import time
+import threading
+import unittest
+
+from dbpedia.hedging import HedgedClient
+
+
+class DelayedClient(object):
+    """
+    Answers with its `endpoint` after `delay` seconds, or fails if
+    `error` is given.
+    """
+
+    def __init__(self, endpoint, delay=0, error=None):
+        self.endpoint = endpoint
+        self.delay = delay
+        self.error = error
+        self.sent = 0
+        self.threads = set()
+
+    def query(self, query, deadline=None):
+        self.sent += 1
+        self.threads.add(threading.current_thread())
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.endpoint
+
+    def close(self):
+        pass
+
+
+class HedgedClientTest(unittest.TestCase):
+    def client(self, primary, mirror, workers=2):
+        client = HedgedClient(primary, mirror, delay=0.05, workers=workers)
+        self.addCleanup(client.close)
+        return client
+
+    def test_fast_primary_isnt_hedged(self):
+        mirror = DelayedClient("mirror")
+        client = self.client(DelayedClient("primary"), mirror)
+        self.assertEqual(client.query(u"q"), "primary")
+        self.assertEqual(mirror.sent, 0)
+        self.assertEqual(client.stats()["hedged"], 0)
+
+    def test_slow_primary_is_hedged(self):
+        client = self.client(DelayedClient("primary", delay=0.5),
+                             DelayedClient("mirror"))
+        start = time.time()
+        self.assertEqual(client.query(u"q"), "mirror")
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(client.stats()["mirror_wins"], 1)
+
+    def test_failing_primary_isnt_hedged(self):
+        mirror = DelayedClient("mirror")
+        client = self.client(DelayedClient("primary", error=ValueError()),
+                             mirror)
+        self.assertRaises(ValueError, client.query, u"q")
+        self.assertEqual(mirror.sent, 0)
+
+    def test_both_failing(self):
+        client = self.client(
+            DelayedClient("primary", delay=0.1, error=ValueError()),
+            DelayedClient("mirror", error=KeyError()))
+        self.assertRaises((ValueError, KeyError), client.query, u"q")
+
+    def test_stats_include_the_primary(self):
+        primary = DelayedClient("primary")
+        primary.stats = lambda: [{"endpoint": "primary"}]
+        client = self.client(primary, DelayedClient("mirror"))
+        self.assertEqual(client.stats()["primary"], [{"endpoint": "primary"}])
+
+    def test_no_thread_per_query(self):
+        primary = DelayedClient("primary")
+        client = self.client(primary, DelayedClient("mirror"))
+        for _ in xrange(20):
+            client.query(u"q")
+        self.assertLessEqual(len(primary.threads), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
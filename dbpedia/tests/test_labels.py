@@ -0,0 +1,87 @@
+# coding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dbpedia.labels import RDFS_LABEL, RDF_TYPE, build_label_index, \
+    open_label_index
+
+RESOURCE = u"http://dbpedia.org/resource/{0}"
+
+
+def label_triple(name, label):
+    return u'<{0}> <{1}> "{2}"@en .\n'.format(RESOURCE.format(name),
+                                              RDFS_LABEL, label)
+
+
+def type_triple(name, uri):
+    return u"<{0}> <{1}> <{2}> .\n".format(RESOURCE.format(name), RDF_TYPE,
+                                           uri)
+
+
+class LabelIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as stream:
+            stream.write(u"".join(lines).encode("utf-8"))
+        return path
+
+    def index(self, labels, types=()):
+        path = os.path.join(self.directory, "labels.idx")
+        types_path = None
+        if types:
+            types_path = self.write("types.nt", types)
+        build_label_index(self.write("labels.nt", labels), path, types_path)
+        index = open_label_index(path)
+        self.addCleanup(index.close)
+        return index
+
+    def test_resolve(self):
+        index = self.index([label_triple("Tom_Cruise", u"Tom Cruise"),
+                            label_triple("Tom", u"Tom"),
+                            label_triple(u"C\xf3rdoba", u"C\\u00F3rdoba")])
+        self.assertEqual(index.resolve(u"tom  CRUISE"),
+                         [RESOURCE.format("Tom_Cruise")])
+        self.assertEqual(index.resolve(u"Tom"), [RESOURCE.format("Tom")])
+        self.assertEqual(index.resolve(u"C\xf3rdoba"),
+                         [RESOURCE.format(u"C\xf3rdoba")])
+        self.assertEqual(index.resolve(u"Tom C"), [])
+
+    def test_types(self):
+        index = self.index(
+            [label_triple("Alien_(film)", u"Alien"),
+             label_triple("Alien", u"Alien")],
+            [type_triple("Alien_(film)", "http://dbpedia.org/ontology/Film"),
+             type_triple("Alien", "http://example.org/Other")])
+        self.assertEqual(sorted(index.resolve(u"alien")),
+                         [RESOURCE.format("Alien"),
+                          RESOURCE.format("Alien_(film)")])
+        self.assertEqual(index.resolve(u"alien", u"dbo:Film"),
+                         [RESOURCE.format("Alien_(film)")])
+        self.assertEqual(index.resolve(u"alien", u"foaf:Person"), [])
+
+    def test_every_label_is_found(self):
+        names = [u"label {0:04d}".format(i) for i in xrange(0, 2000, 3)]
+        index = self.index(label_triple(x.replace(u" ", u"_"), x)
+                           for x in names)
+        for name in names:
+            self.assertEqual(index.resolve(name),
+                             [RESOURCE.format(name.replace(u" ", u"_"))])
+        for missing in [u"a", u"label 0001", u"label 1000", u"z"]:
+            self.assertEqual(index.resolve(missing), [])
+
+    def test_no_index(self):
+        self.assertIsNone(open_label_index(None))
+        self.assertIsNone(open_label_index(
+            os.path.join(self.directory, "missing.idx")))
+        self.assertIsNone(open_label_index(self.write("empty.idx", [])))
+
+
+if __name__ == "__main__":
+    unittest.main()
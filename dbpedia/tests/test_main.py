@@ -0,0 +1,172 @@
+# coding: utf-8
+
+import re
+import unittest
+
+import main
+
+
+class IdlePool(object):
+    """
+    Takes tasks without running them.
+    """
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, function, *args):
+        self.submitted.append(args)
+
+
+class IterCompiledTest(unittest.TestCase):
+    def setUp(self):
+        self.consumed = 0
+
+        def compile_record(question):
+            record = main.new_record(question)
+            record["query"] = u"query of {0}".format(question)
+            record["query_type"] = "define"
+            return record
+
+        self.addCleanup(setattr, main, "compile_record", main.compile_record)
+        main.compile_record = compile_record
+
+    def questions(self, items):
+        for item in items:
+            self.consumed += 1
+            yield item
+
+    def test_repeats_dont_hold_a_batch_back(self):
+        pool = IdlePool()
+        questions = self.questions([u"a", u"b"] + [u"a"] * 1000)
+        pairs = main.iter_compiled(questions, pool, combine_size=8)
+        record, task = next(pairs)
+        self.assertEqual(record["question"], u"a")
+        self.assertEqual(len(pool.submitted), 1)
+        self.assertLess(self.consumed, 100)
+
+    def test_full_batches(self):
+        pool = IdlePool()
+        questions = [unicode(i) for i in xrange(20)]
+        pairs = list(main.iter_compiled(questions, pool, combine_size=8))
+        self.assertEqual(len(pairs), 20)
+        self.assertEqual(len(pool.submitted), 3)
+
+
+class RenderRecordTest(unittest.TestCase):
+    def record(self, query_type):
+        record = main.new_record(u"How old is Bob Dylan?")
+        record.update(query=u"SELECT ?x1 WHERE {}", query_type=query_type,
+                      target=u"x1")
+        return record
+
+    def test_no_bindings(self):
+        results = {"head": {}, "results": {"bindings": []}}
+        record = main.render_record(self.record("age"), results)
+        self.assertEqual(record["answers"], [])
+        self.assertNotIn("error", record)
+
+    def test_bindings(self):
+        binding = {u"x1": {u"type": u"literal", u"value": u"a car"}}
+        results = {"head": {}, "results": {"bindings": [binding]}}
+        record = main.render_record(self.record("define"), results)
+        self.assertEqual(record["answers"], [u"a car"])
+
+
+class CountingClient(object):
+    """
+    Has `total` answers to every query, counts the queries sent.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.sent = []
+
+    def query(self, query, query_type=None, deadline=None):
+        self.sent.append("count")
+        count = {"count": {"type": "literal", "value": unicode(self.total)}}
+        return {"head": {}, "results": {"bindings": [count]}}
+
+    def query_stream(self, query, query_type=None, deadline=None):
+        self.sent.append("page")
+        binding = {"x1": {"type": "literal", "value": u"a"}}
+        return {"head": {},
+                "results": {"bindings": [binding] * self.total}}
+
+
+class CountFirstTest(unittest.TestCase):
+    QUERY = u"SELECT DISTINCT ?x1 WHERE {\n  ?x0 ?p ?x1.\n}\n"
+
+    def setUp(self):
+        for name in ("sparql", "COUNT_FIRST", "MAX_PAGES", "PAGE_SIZE"):
+            self.addCleanup(setattr, main, name, getattr(main, name))
+        main.COUNT_FIRST = True
+        main.PAGE_SIZE = 10
+
+    def run_query(self, total):
+        main.sparql = CountingClient(total)
+        results = main.run_query(self.QUERY, "enum", target=u"x1")
+        return results, list(results["results"]["bindings"])
+
+    def test_counted_before_fetching(self):
+        results, bindings = self.run_query(3)
+        self.assertEqual(results["head"]["count"], 3)
+        self.assertEqual(len(bindings), 3)
+        self.assertEqual(main.sparql.sent, ["count", "page"])
+
+    def test_nothing_to_fetch(self):
+        results, bindings = self.run_query(0)
+        self.assertEqual(bindings, [])
+        self.assertEqual(main.sparql.sent, ["count"])
+
+    def test_only_counted(self):
+        main.MAX_PAGES = 0
+        results, bindings = self.run_query(3)
+        self.assertEqual(main.sparql.sent, ["count"])
+        self.assertEqual(results["results"]["bindings"].cursor, 0)
+
+
+class WikipediaClient(object):
+    """
+    Finds the resource of every page, keeping the queries sent.
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    def query(self, query, query_type=None, deadline=None):
+        self.sent.append(query)
+        pages = re.search(r"VALUES \?page \{ (.*) \}", query).group(1)
+        bindings = [{"page": {"type": "uri", "value": page[1:-1]},
+                     "url": {"type": "uri", "value": u"resource"}}
+                    for page in pages.split()]
+        return {"head": {}, "results": {"bindings": bindings}}
+
+
+class WikipediaTest(unittest.TestCase):
+    URL = u"http://es.wikipedia.org/wiki/C\xf3rdoba"
+
+    def setUp(self):
+        self.addCleanup(setattr, main, "sparql", main.sparql)
+        main.sparql = WikipediaClient()
+
+    def test_non_ascii_arguments(self):
+        url = main.decode_input(self.URL.encode("utf-8"))
+        self.assertEqual(url, self.URL)
+        self.assertEqual(main.wikipedia2dbpedia(url), u"resource")
+
+    def test_invalid_urls_arent_queried(self):
+        urls = [u"http://a b", self.URL, u"http://<c>", u"http://d e"]
+        triples = list(main.iter_wikipedia2dbpedia(urls, group_size=2,
+                                                   workers=1))
+        self.assertEqual(triples, [
+            (urls[0], None, u"Invalid URL"),
+            (urls[1], u"resource", None),
+            (urls[2], None, u"Invalid URL"),
+            (urls[3], None, u"Invalid URL"),
+        ])
+        self.assertEqual(len(main.sparql.sent), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
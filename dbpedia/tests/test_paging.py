@@ -0,0 +1,80 @@
+# coding: utf-8
+
+import re
+import unittest
+
+from dbpedia.paging import PagedBindings, iter_pages, page_query, \
+    count_query
+
+QUERY = u"SELECT DISTINCT ?x1 WHERE {\n  ?x0 ?p ?x1.\n}\n"
+
+
+class StreamingClient(object):
+    """
+    Streams the page of `total` bindings a query asks for, counting the
+    bindings decoded.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.read = 0
+        self.queries = []
+
+    def query_stream(self, query, query_type=None, deadline=None):
+        self.queries.append(query)
+        limit = int(re.search(r"LIMIT (\d+)", query).group(1))
+        offset = int(re.search(r"OFFSET (\d+)", query).group(1))
+        end = min(offset + limit, self.total)
+        return {"head": {}, "results": {"bindings": self._iter(offset, end)}}
+
+    def _iter(self, start, end):
+        for i in xrange(start, end):
+            self.read += 1
+            yield {"x1": {"type": "literal", "value": unicode(i)}}
+
+
+def values(bindings):
+    return [int(x["x1"]["value"]) for x in bindings]
+
+
+class PagingTest(unittest.TestCase):
+    def test_page_query(self):
+        self.assertTrue(page_query(QUERY, "x1", 11, 20).endswith(
+            u"}\nORDER BY ?x1\nLIMIT 11\nOFFSET 20\n"))
+
+    def test_count_query(self):
+        self.assertIn(u"SELECT (COUNT(DISTINCT ?x1) AS ?count) WHERE {",
+                      count_query(QUERY))
+        self.assertRaises(ValueError, count_query, u"ASK { ?s ?p ?o }")
+
+    def test_all_pages(self):
+        client = StreamingClient(25)
+        bindings = PagedBindings(iter_pages(client, QUERY, "x1", size=10))
+        self.assertEqual(values(bindings), range(25))
+        self.assertEqual(len(client.queries), 3)
+        self.assertIsNone(bindings.cursor)
+
+    def test_cursor(self):
+        client = StreamingClient(25)
+        bindings = PagedBindings(iter_pages(client, QUERY, "x1", offset=5,
+                                            size=10, pages=1))
+        self.assertEqual(values(bindings), range(5, 15))
+        self.assertEqual(bindings.cursor, 15)
+
+    def test_exact_pages(self):
+        client = StreamingClient(20)
+        bindings = PagedBindings(iter_pages(client, QUERY, "x1", size=10))
+        self.assertEqual(values(bindings), range(20))
+        self.assertEqual(len(client.queries), 2)
+
+    def test_pages_are_decoded_as_read(self):
+        client = StreamingClient(25)
+        bindings = iter(PagedBindings(iter_pages(client, QUERY, "x1",
+                                                 size=10)))
+        next(bindings)
+        next(bindings)
+        self.assertEqual(client.read, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+# coding: utf-8
+
+import sys
+import time
+import threading
+import unittest
+
+from dbpedia.cache import CachedClient, ResultCache
+from dbpedia.client import DeadlineExceeded
+
+
+class SlowClient(object):
+    """
+    Answers every query after `latency` seconds, unless its deadline
+    passes first.
+    """
+
+    endpoint = "slow"
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.sent = []
+
+    def query(self, query, deadline=None):
+        self.requests += 1
+        self.sent.append(query)
+        if deadline is not None and deadline - time.time() < self.latency:
+            time.sleep(max(deadline - time.time(), 0))
+            raise DeadlineExceeded("Deadline exceeded")
+        time.sleep(self.latency)
+        return results_of(query)
+
+    def query_many(self, queries, deadline=None):
+        self.requests += 1
+        self.sent.extend(queries)
+        time.sleep(self.latency)
+        answers = []
+        for query in queries:
+            try:
+                if query == u"bad":
+                    raise ValueError("Bad query")
+                answers.append((results_of(query), None))
+            except ValueError:
+                answers.append((None, sys.exc_info()))
+        return answers
+
+    def query_stream(self, query, deadline=None):
+        self.requests += 1
+        self.sent.append(query)
+        time.sleep(self.latency)
+        return results_of(query)
+
+
+def results_of(query):
+    binding = {"x0": {"type": "literal", "value": query}}
+    return {"head": {"vars": []}, "results": {"bindings": [binding] * 3}}
+
+
+def run_together(*calls):
+    """
+    Runs each `(function, args)` of `calls` on its own thread, starting
+    them 20ms apart, and returns their values.
+    """
+
+    values = [None] * len(calls)
+
+    def run(i, function, args):
+        values[i] = function(*args)
+
+    threads = [threading.Thread(target=run, args=(i,) + call)
+               for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+    return values
+
+
+class MixedDeadlinesTest(unittest.TestCase):
+    def test_waiter_outlives_leader(self):
+        client = SlowClient(0.3)
+        sparql = CachedClient(client, ResultCache(path=None))
+        outcomes = {}
+
+        def ask(name, seconds):
+            try:
+                sparql.query(u"SELECT * WHERE { ?s ?p ?o }",
+                             deadline=time.time() + seconds)
+                outcomes[name] = "answered"
+            except DeadlineExceeded:
+                outcomes[name] = "deadline"
+
+        leader = threading.Thread(target=ask, args=("leader", 0.1))
+        waiter = threading.Thread(target=ask, args=("waiter", 5))
+        leader.start()
+        time.sleep(0.02)
+        waiter.start()
+        leader.join()
+        waiter.join()
+
+        self.assertEqual(outcomes, {"leader": "deadline",
+                                    "waiter": "answered"})
+        self.assertEqual(client.requests, 2)
+
+    def test_waiters_share_an_answer(self):
+        client = SlowClient(0.2)
+        sparql = CachedClient(client, ResultCache(path=None, ttls={}))
+        threads = [threading.Thread(target=sparql.query,
+                                    args=(u"SELECT * WHERE { ?s ?p ?o }",))
+                   for _ in xrange(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(client.requests, 1)
+
+
+class BatchCoalescingTest(unittest.TestCase):
+    def setUp(self):
+        self.client = SlowClient(0.2)
+        self.sparql = CachedClient(self.client,
+                                   ResultCache(path=None, ttls={}))
+
+    def test_batches_share_queries_in_flight(self):
+        first, second = run_together(
+            (self.sparql.query_many, ([u"a", u"b"],)),
+            (self.sparql.query_many, ([u"b", u"c"],)))
+        self.assertEqual(sorted(self.client.sent), [u"a", u"b", u"c"])
+        self.assertEqual(first[1], (results_of(u"b"), None))
+        self.assertEqual(second[0], (results_of(u"b"), None))
+        self.assertEqual(self.sparql.flights.stats()["coalesced"], 1)
+
+    def test_errors_are_shared(self):
+        first, second = run_together(
+            (self.sparql.query_many, ([u"bad"],)),
+            (self.sparql.query_many, ([u"bad", u"a"],)))
+        self.assertEqual(self.client.sent, [u"bad", u"a"])
+        for answers in (first, second):
+            self.assertIsNone(answers[0][0])
+            self.assertIsInstance(answers[0][1][1], ValueError)
+
+    def test_repeats_in_a_batch(self):
+        answers = self.sparql.query_many([u"a", u"a"])
+        self.assertEqual(self.client.sent, [u"a"])
+        self.assertEqual(answers[0], answers[1])
+
+    def test_batch_waits_on_a_single_query(self):
+        single, many = run_together(
+            (self.sparql.query, (u"a",)),
+            (self.sparql.query_many, ([u"a", u"b"],)))
+        self.assertEqual(self.client.sent, [u"a", u"b"])
+        self.assertEqual(many[0], (single, None))
+
+
+class StreamCoalescingTest(unittest.TestCase):
+    def stream(self, sparql, delay=0):
+        results = sparql.query_stream(u"a")
+        time.sleep(delay)
+        return list(results["results"]["bindings"])
+
+    def test_waiters_share_a_read_stream(self):
+        client = SlowClient(0.1)
+        sparql = CachedClient(client, ResultCache(path=None, ttls={}))
+        leader, waiter = run_together((self.stream, (sparql, 0.2)),
+                                      (self.stream, (sparql,)))
+        self.assertEqual(client.requests, 1)
+        self.assertEqual(waiter, leader)
+
+    def test_large_streams_are_sent_again(self):
+        client = SlowClient(0.1)
+        sparql = CachedClient(client, ResultCache(path=None, ttls={}),
+                              max_bindings=2)
+        leader, waiter = run_together((self.stream, (sparql, 0.2)),
+                                      (self.stream, (sparql,)))
+        self.assertEqual(client.requests, 2)
+        self.assertEqual(waiter, leader)
+
+    def test_unread_streams_are_sent_again(self):
+        client = SlowClient(0.1)
+        sparql = CachedClient(client, ResultCache(path=None, ttls={}))
+        sparql.query_stream(u"a")
+        self.assertEqual(len(self.stream(sparql)), 3)
+        self.assertEqual(client.requests, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+# coding: utf-8
+
+import json
+import time
+import socket
+import unittest
+
+from dbpedia.client import SparqlClient, SparqlError
+from sparql_stub import StubEndpoint
+
+QUERY = u"SELECT * WHERE { ?s ?p ?o }"
+BODY = '{"head": {"vars": []}, "results": {"bindings": []}}'
+OTHER = u"SELECT ?o WHERE { ?s ?p ?o }"
+OTHER_BODY = json.dumps({
+    "head": {"vars": ["o"]},
+    "results": {"bindings": [{"o": {"type": "literal", "value": "a"}}]}})
+
+
+class BrokenUpstream(object):
+    endpoint = "broken"
+
+    def query(self, query):
+        raise socket.error("Connection refused")
+
+
+class StubEndpointTest(unittest.TestCase):
+    def start(self, recordings, **kwargs):
+        stub = StubEndpoint(("127.0.0.1", 0), recordings, **kwargs)
+        stub.start()
+        self.addCleanup(stub.shutdown)
+        client = SparqlClient(stub.url, pool_size=1)
+        self.addCleanup(client.close)
+        return stub, client
+
+    def test_replays_recordings(self):
+        stub, client = self.start({QUERY: (200, BODY)})
+        self.assertEqual(client.query(QUERY)["results"]["bindings"], [])
+        with self.assertRaises(SparqlError) as raised:
+            client.query(u"SELECT ?s WHERE { ?s ?p ?o }")
+        self.assertEqual(raised.exception.status, 404)
+        self.assertEqual(stub.stats()["hits"], 1)
+
+    def test_kept_alive_requests_dont_stall(self):
+        stub, client = self.start({QUERY: (200, BODY)})
+        client.query(QUERY)
+        start = time.time()
+        for _ in xrange(10):
+            client.query(QUERY)
+        # With Nagle on each one waits ~40ms for a delayed ACK.
+        self.assertLess((time.time() - start) / 10, 0.02)
+
+    def test_combined_queries_answered_from_recordings(self):
+        stub, client = self.start({QUERY: (200, BODY),
+                                   OTHER: (200, OTHER_BODY)})
+        (first, error), (second, failure) = client.query_many([QUERY, OTHER])
+        self.assertIsNone(error)
+        self.assertIsNone(failure)
+        self.assertEqual(first["results"]["bindings"], [])
+        self.assertEqual(second["results"]["bindings"],
+                         json.loads(OTHER_BODY)["results"]["bindings"])
+        self.assertEqual(stub.stats(), {"hits": 1, "misses": 0,
+                                        "errors": 0, "recorded": 0})
+
+    def test_upstream_failure_is_a_502(self):
+        stub, client = self.start({}, upstream=BrokenUpstream())
+        with self.assertRaises(SparqlError) as raised:
+            client.query(QUERY)
+        self.assertEqual(raised.exception.status, 502)
+        self.assertEqual(stub.recordings, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# coding: utf-8
+
+import re
+import unittest
+
+import main
+from dbpedia.sweep import SweepError, compile_sweep
+
+NAMES = [u"Tom Cruise", u"Bob Dylan", u"Tom Cruise", u'a "b']
+
+
+class ValuesClient(object):
+    """
+    Answers a sweep query with one actor per name in its VALUES block,
+    failing the blocks holding a name in `failing`.
+    """
+
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.sent = 0
+
+    def query(self, query, query_type=None, deadline=None):
+        self.sent += 1
+        values = re.search(r"VALUES \?entity \{ (.*) \}", query).group(1)
+        literals = re.findall(r'"((?:[^"\\]|\\.)*)"@en', values)
+        for literal in literals:
+            if literal in self.failing:
+                raise ValueError(literal)
+        bindings = [{
+            "entity": {"type": "literal", "xml:lang": "en",
+                       "value": literal.replace(u'\\"', u'"')},
+            "x2": {"type": "literal", "xml:lang": "en",
+                   "value": u"actor of {0}".format(literal)},
+        } for literal in literals]
+        return {"head": {}, "results": {"bindings": bindings}}
+
+
+class SweepTest(unittest.TestCase):
+    def template(self, name):
+        return main.dbpedia.get_template(name)
+
+    def test_distinct_names_per_query(self):
+        sweep = compile_sweep(self.template("ActorsOfQuestion"), NAMES, 2)
+        self.assertEqual([literals for _, literals in sweep.queries], [
+            [u'"Tom Cruise"@en', u'"Bob Dylan"@en'],
+            [u'"a \\"b"@en'],
+        ])
+        self.assertIn(u'VALUES ?entity { "Tom Cruise"@en "Bob Dylan"@en }',
+                      sweep.queries[0][0])
+        self.assertEqual(sweep.target, u"?x2")
+
+    def test_one_particle_only(self):
+        self.assertRaises(SweepError, compile_sweep,
+                          self.template("ActedOnTwoQuestion"), NAMES, 2)
+        self.assertRaises(SweepError, compile_sweep,
+                          self.template("ListMoviesQuestion"), NAMES, 2)
+
+    def test_rows_in_input_order(self):
+        sweep = compile_sweep(self.template("ActorsOfQuestion"), NAMES, 2)
+        client = ValuesClient()
+        bindings = {}
+        for query, _ in sweep.queries:
+            bindings.update(sweep.split(client.query(query)))
+        rows = sweep.table(bindings)
+        self.assertEqual([results["results"]["bindings"][0]["x2"]["value"]
+                          for results, _ in rows],
+                         [u"actor of Tom Cruise", u"actor of Bob Dylan",
+                          u"actor of Tom Cruise", u'actor of a \\"b'])
+
+    def test_sweep_template(self):
+        self.addCleanup(setattr, main, "sparql", main.sparql)
+        main.sparql = ValuesClient(failing=[u"Bob Dylan"])
+        table = main.sweep_template(self.template("ActorsOfQuestion"), NAMES,
+                                    workers=1, block_size=1)
+        self.assertEqual(main.sparql.sent, 3)
+        self.assertEqual(table[0], {"row": 0, "name": u"Tom Cruise",
+                                    "answers": [u"actor of Tom Cruise"]})
+        self.assertEqual(table[1]["error"], u"ValueError: Bob Dylan")
+        self.assertEqual(table[2]["answers"], table[0]["answers"])
+        self.assertNotIn("error", table[3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# coding: utf-8
+
+import time
+import unittest
+
+from dbpedia.app import install
+from dbpedia.timing import Timings, NULL_TIMINGS
+
+
+class Clock(object):
+    """
+    Stand-in for `time.time`, each reading one second later.
+    """
+
+    def __init__(self):
+        self.readings = 0
+
+    def __call__(self):
+        self.readings += 1
+        return float(self.readings)
+
+
+class TimingsTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.addCleanup(setattr, time, "time", time.time)
+        time.time = self.clock
+
+    def test_stage_resumed(self):
+        timings = Timings(u"question")
+        stage = timings.stage("matching")
+        stage.start()
+        stage.stop()
+        stage.start()
+        stage.stop()
+        self.assertEqual(timings.stages, {"matching": 2.0})
+
+    def test_disabled_timings_dont_read_the_clock(self):
+        app = install()
+        app.load()
+        app.compiled = None
+        target, query, userdata = app.get_query(u"Who is Tom Cruise?",
+                                                NULL_TIMINGS)
+        self.assertIsNotNone(query)
+        self.assertEqual(self.clock.readings, 0)
+
+    def test_compilation_stages(self):
+        app = install()
+        app.load()
+        app.compiled = None
+        timings = Timings(u"Who is Tom Cruise?")
+        app.get_query(timings.question, timings)
+        self.assertEqual(set(timings.stages),
+                         set(["tagging", "matching", "compilation"]))
+
+
+if __name__ == "__main__":
+    unittest.main()